@@ -3,33 +3,95 @@ Wix to Offline Converter - Web Application
 A Flask-based web interface for converting Wix websites to offline files
 """
 
+import time
+
+# Measured for /healthz from before Flask is imported, gunicorn workers should load in well under a second
+APP_IMPORT_STARTED = time.monotonic()
+
 from flask import Flask, render_template, request, jsonify, send_file, Response
 import asyncio
+import hmac
 import os
 import json
 import shutil
-import zipfile
+import sys
 import threading
-import queue
 from datetime import datetime
-from urllib.parse import urlparse
 import uuid
 
-# Import the wix scraper functions
-from wixscraper import scrape_wix_site
+# The scraper (Playwright, PIL, requests) is imported by the jobs that run it,
+# so workers answer requests before any of it is loaded
+from conversion import scrape_options, job_output_dir, package_site
+from crawlreport import keep_report, load_job_report
+from broker import get_broker, SQLiteBroker
+from events import EventBus
+from retention import RetentionManager, parse_ttl_hours
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'wix-converter-secret-key'
+# Token required by the /admin endpoints (X-Admin-Token header), they are off without it
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN', '')
+# Token of the workers on other hosts (X-Broker-Token header), the /broker endpoints are off without it
+app.config['BROKER_TOKEN'] = os.environ.get('BROKER_TOKEN', '')
 
 # Store for conversion jobs
 conversion_jobs = {}
-message_queues = {}
+batch_jobs = {}
+event_bus = EventBus()
+
+# Longest time a single /stream response is held open before the client reconnects
+STREAM_MAX_SECONDS = 60
+STREAM_KEEPALIVE_SECONDS = 15
+# Longest wait allowed for the /events long-poll
+LONG_POLL_MAX_SECONDS = 25
 
 # Output directory
-OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'converted_sites')
+OUTPUT_DIR = os.environ.get('OUTPUT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'converted_sites'))
 if not os.path.exists(OUTPUT_DIR):
     os.makedirs(OUTPUT_DIR)
 
+# Downloaded images and fonts shared by all jobs
+ASSET_CACHE_DIR = os.environ.get('ASSET_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'asset_cache'))
+asset_cache = None
+asset_cache_lock = threading.Lock()
+
+# Limits for batch submissions
+MAX_BATCH_CONCURRENCY = int(os.environ.get('MAX_BATCH_CONCURRENCY', 2))
+MAX_BATCH_BROWSERS = int(os.environ.get('MAX_BATCH_BROWSERS', 1))
+
+# Distributed mode: with BROKER_URL set, jobs are run by standalone workers (worker.py)
+# and this process only enqueues them and relays their progress
+BROKER_URL = os.environ.get('BROKER_URL', '')
+broker = get_broker(BROKER_URL) if BROKER_URL else None
+if broker is not None and not isinstance(broker, SQLiteBroker):
+    raise ValueError('The web app holds the broker database, set BROKER_URL to a local sqlite:/// path')
+BROKER_POLL_SECONDS = 0.5
+BROKER_PRUNE_SECONDS = 24 * 3600
+
+# Output retention: TTL per job, global quota with LRU eviction
+retention = RetentionManager(
+    OUTPUT_DIR,
+    conversion_jobs,
+    ttl_hours=float(os.environ.get('OUTPUT_TTL_HOURS', 24)),
+    quota_mb=float(os.environ.get('OUTPUT_QUOTA_MB', 2048)),
+    drop_site_dir=os.environ.get('OUTPUT_DROP_SITE_DIR', 'false').lower() == 'true',
+    on_evict=event_bus.discard,
+    broker=broker
+)
+# Not in the processes of optimize.py's pool, which import the main module as __mp_main__
+if __name__ != '__mp_main__':
+    retention.start(interval=int(os.environ.get('RETENTION_SWEEP_SECONDS', 300)))
+
+
+def get_asset_cache():
+    """The asset cache, created by the first job that needs it"""
+    global asset_cache
+    with asset_cache_lock:
+        if asset_cache is None:
+            from assetcache import AssetCache
+            asset_cache = AssetCache(ASSET_CACHE_DIR, max_bytes=int(float(os.environ.get('ASSET_CACHE_MB', 1024)) * 1024 * 1024))
+        return asset_cache
+
 
 def run_async(coro):
     """Helper to run async code in a new event loop"""
@@ -41,97 +103,208 @@ def run_async(coro):
         loop.close()
 
 
-def convert_website_task(job_id, site_url, options):
-    """Background task to convert a website"""
-    msg_queue = message_queues.get(job_id)
-    
+def job_progress_callback(job_id):
+    """Progress callback publishing to the job's event stream"""
     def progress_callback(message):
-        if msg_queue:
-            msg_queue.put(message)
+        job = conversion_jobs[job_id]
+        if job['status'] == 'queued':
+            job['status'] = 'running'
+        event_bus.publish(job_id, message)
         print(f"[{job_id}] {message}")
-    
+    return progress_callback
+
+
+def build_scrape_kwargs(job_id, site_url, options):
+    """scrape_wix_site arguments for a job running in this process"""
+    kwargs = scrape_options(site_url, options)
+    kwargs['output_dir'] = job_output_dir(OUTPUT_DIR, job_id)
+    kwargs['progress_callback'] = job_progress_callback(job_id)
+    return kwargs
+
+
+def complete_job(job_id, output_path, zip_path, zip_filename, budget=None, crawl_summary=None):
+    """
+    Record the packaged output of a job and mark it completed.
+    budget is the job's budget report, a partial result when the budget ran out.
+    crawl_summary is the summary of the crawl report, the full report is read from disk by /status/<job_id>.
+    """
+    conversion_jobs[job_id]['status'] = 'completed'
+    conversion_jobs[job_id]['output_path'] = output_path
+    conversion_jobs[job_id]['zip_path'] = zip_path
+    conversion_jobs[job_id]['zip_filename'] = zip_filename
+    if budget is not None:
+        conversion_jobs[job_id]['budget'] = budget
+        conversion_jobs[job_id]['partial'] = budget['partial']
+    if crawl_summary is not None:
+        conversion_jobs[job_id]['crawl_summary'] = crawl_summary
+    retention.touch(job_id)
+    retention.drop_site(job_id)
+    if budget is not None and budget['partial']:
+        event_bus.publish(job_id, f"Conversion stopped early ({budget['exceeded']}), "
+                                  f"{len(budget['skipped'])} page(s) skipped. Partial result is ready.")
+    else:
+        event_bus.publish(job_id, "Conversion completed successfully!")
+    event_bus.close(job_id, 'completed')
+
+
+def finish_job(job_id, site_url, output_path, budget=None):
+    """Package a scraped site as a ZIP and mark the job completed"""
+    job_progress_callback(job_id)("Creating ZIP archive...")
+    zip_path, zip_filename = package_site(OUTPUT_DIR, job_id, site_url, output_path)
+    complete_job(job_id, output_path, zip_path, zip_filename, budget, keep_report(OUTPUT_DIR, job_id, output_path))
+
+
+def fail_job(job_id, error, error_details=None):
+    conversion_jobs[job_id]['status'] = 'failed'
+    conversion_jobs[job_id]['error'] = str(error)
+    event_bus.publish(job_id, f"Error: {str(error)}")
+    event_bus.close(job_id, 'failed')
+    print(f"[{job_id}] Error: {str(error)}")
+    if error_details:
+        print(f"[{job_id}] Traceback:\n{error_details}")
+
+
+def convert_website_task(job_id, site_url, options):
+    """Background task to convert a website"""
     try:
         conversion_jobs[job_id]['status'] = 'running'
-        progress_callback("Starting conversion...")
-        
-        # Parse options
-        block_primary_folder = options.get('blockPrimaryFolder', '')
-        wait_time = int(options.get('wait', 3))
-        recursive = options.get('recursive', False)
-        dark_website = options.get('darkWebsite', False)
-        force_download = options.get('forceDownload', False)
-        
-        # Build metatags
-        metatags = {
-            '/': {
-                'title': options.get('title', 'Website'),
-                'description': options.get('description', ''),
-                'keywords': options.get('keywords', ''),
-                'canonical': site_url,
-                'image': options.get('image', ''),
-                'author': options.get('author', '')
-            }
-        }
-        
-        # Build mapData
-        mapData = {
-            'latitude': options.get('mapLatitude', '0'),
-            'longitude': options.get('mapLongitude', '0'),
-            'zoom': options.get('mapZoom', '12'),
-            'mapMarker': {
-                'latitude': options.get('mapMarkerLatitude', options.get('mapLatitude', '0')),
-                'longitude': options.get('mapMarkerLongitude', options.get('mapLongitude', '0')),
-                'popup': options.get('mapPopup', '')
-            }
-        }
-        
-        # Create job-specific output directory
-        job_output_dir = os.path.join(OUTPUT_DIR, job_id)
-        if not os.path.exists(job_output_dir):
-            os.makedirs(job_output_dir)
+        kwargs = build_scrape_kwargs(job_id, site_url, options)
+        kwargs['progress_callback']("Starting conversion...")
         
         # Run the scraper
-        output_path = run_async(scrape_wix_site(
-            site=site_url,
-            blockPrimaryFolder=block_primary_folder,
-            wait=wait_time,
-            recursive=recursive,
-            darkWebsite=dark_website,
-            forceDownloadAgain=force_download,
-            metatags=metatags,
-            mapData=mapData,
-            output_dir=job_output_dir,
-            progress_callback=progress_callback
-        ))
+        from wixscraper import scrape_wix_site
+        output_path = run_async(scrape_wix_site(assetCache=get_asset_cache(), **kwargs))
         
-        # Create ZIP file
-        progress_callback("Creating ZIP archive...")
-        hostname = urlparse(site_url).hostname
-        zip_filename = f"{hostname}_{job_id}.zip"
-        zip_path = os.path.join(OUTPUT_DIR, zip_filename)
+        budget = kwargs['budget']
+        finish_job(job_id, site_url, output_path, budget.report() if budget.limited() else None)
         
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(output_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, job_output_dir)
-                    zipf.write(file_path, arcname)
+    except Exception as e:
+        import traceback
+        fail_job(job_id, e, traceback.format_exc())
+
+
+def convert_batch_task(batch_id):
+    """Background task converting all sites of a batch with shared browsers and asset cache"""
+    batch = batch_jobs[batch_id]
+    job_ids = batch['job_ids']
+    batch['status'] = 'running'
+    
+    def on_site_done(index, result):
+        job_id = job_ids[index]
+        if result['status'] != 'completed':
+            fail_job(job_id, result.get('error', 'Unknown error'))
+            return
+        try:
+            finish_job(job_id, result['site'], result['output_path'], result.get('budget'))
+        except Exception as e:
+            fail_job(job_id, e)
+    
+    try:
+        sites = []
+        for job_id in job_ids:
+            job = conversion_jobs[job_id]
+            sites.append(build_scrape_kwargs(job_id, job['url'], job['options']))
         
-        conversion_jobs[job_id]['status'] = 'completed'
-        conversion_jobs[job_id]['output_path'] = output_path
-        conversion_jobs[job_id]['zip_path'] = zip_path
-        conversion_jobs[job_id]['zip_filename'] = zip_filename
-        progress_callback("Conversion completed successfully!")
+        from batch import run_batch
+        report = run_async(run_batch(
+            sites,
+            output_dir=OUTPUT_DIR,
+            concurrency=batch['concurrency'],
+            browsers=batch['browsers'],
+            cache=get_asset_cache(),
+            on_site_done=on_site_done
+        ))
+        batch['status'] = 'completed'
+        batch['seconds'] = report['seconds']
         
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        conversion_jobs[job_id]['status'] = 'failed'
-        conversion_jobs[job_id]['error'] = str(e)
-        if msg_queue:
-            msg_queue.put(f"Error: {str(e)}")
-        print(f"[{job_id}] Error: {str(e)}")
-        print(f"[{job_id}] Traceback:\n{error_details}")
+        batch['status'] = 'failed'
+        batch['error'] = str(e)
+        print(f"[batch {batch_id}] Error: {str(e)}")
+        for job_id in job_ids:
+            if conversion_jobs[job_id]['status'] in ('queued', 'running'):
+                fail_job(job_id, e)
+
+
+def sync_broker():
+    """Relay progress and results of jobs run by remote workers"""
+    cursor = 0
+    last_prune = 0
+    while True:
+        try:
+            events, cursor = broker.events_since(cursor)
+            for event in events:
+                job_id = event['job_id']
+                job = conversion_jobs.get(job_id)
+                if job is None:
+                    continue
+                if event['event'] != 'end':
+                    if job['status'] == 'queued':
+                        job['status'] = 'running'
+                    event_bus.publish(job_id, event['data'])
+                    continue
+                
+                remote = broker.get(job_id) or {}
+                result = remote.get('result') or {}
+                if remote.get('status') == 'completed':
+                    complete_job(job_id, result.get('output_path'), result.get('zip_path'), result.get('zip_filename'),
+                                 result.get('budget'), result.get('crawl_summary'))
+                else:
+                    job['status'] = 'failed'
+                    job['error'] = remote.get('error') or 'Unknown error'
+                    event_bus.close(job_id, 'failed')
+            
+            if time.time() - last_prune > BROKER_PRUNE_SECONDS:
+                broker.prune(BROKER_PRUNE_SECONDS)
+                last_prune = time.time()
+            
+            if not events:
+                time.sleep(BROKER_POLL_SECONDS)
+        except Exception as e:
+            print(f"[broker] Sync failed: {e}")
+            time.sleep(5)
+
+
+def start_job(job_id):
+    """Run a job in a background thread, or hand it to the workers in distributed mode"""
+    job = conversion_jobs[job_id]
+    if broker is not None:
+        broker.enqueue(job_id, {'url': job['url'], 'options': job['options']})
+        return
+    
+    thread = threading.Thread(
+        target=convert_website_task,
+        args=(job_id, job['url'], job['options'])
+    )
+    thread.daemon = True
+    thread.start()
+
+
+def create_job(site_url, options):
+    """Register a new conversion job and its event stream"""
+    # Validate URL
+    if not site_url.startswith('http'):
+        site_url = 'https://' + site_url
+    
+    # Create job ID
+    job_id = str(uuid.uuid4())[:8]
+    
+    # Create the progress event buffer for this job
+    event_bus.open(job_id)
+
+    # An invalid retentionHours falls back to the server default
+    if 'retentionHours' in options:
+        options = {**options, 'retentionHours': parse_ttl_hours(options['retentionHours'], retention.ttl_hours)}
+    
+    # Initialize job
+    conversion_jobs[job_id] = {
+        'id': job_id,
+        'url': site_url,
+        'status': 'queued',
+        'created_at': datetime.now().isoformat(),
+        'options': options
+    }
+    return job_id
 
 
 @app.route('/')
@@ -149,34 +322,111 @@ def convert():
     if not site_url:
         return jsonify({'error': 'Please provide a website URL'}), 400
     
-    # Validate URL
-    if not site_url.startswith('http'):
-        site_url = 'https://' + site_url
+    # Make room before starting a new job
+    retention.request_sweep()
     
-    # Create job ID
-    job_id = str(uuid.uuid4())[:8]
+    job_id = create_job(site_url, data.get('options', {}))
+    start_job(job_id)
+    
+    return jsonify({'job_id': job_id, 'status': 'started'})
+
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """
+    Start a batch of conversions.
+    Body: {"sites": ["https://...", {"url": "https://...", "options": {...}}], "options": {...},
+           "concurrency": 2}
+    Per-site options override the batch options.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Please provide a JSON object'}), 400
+    sites = data.get('sites')
     
-    # Create message queue for this job
-    message_queues[job_id] = queue.Queue()
+    if not isinstance(sites, list) or not sites:
+        return jsonify({'error': 'Please provide a list of sites'}), 400
     
-    # Initialize job
-    conversion_jobs[job_id] = {
-        'id': job_id,
-        'url': site_url,
+    try:
+        concurrency = int(data.get('concurrency', MAX_BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency must be a whole number'}), 400
+    
+    default_options = data.get('options', {})
+    if not isinstance(default_options, dict):
+        return jsonify({'error': 'options must be an object'}), 400
+    entries = []
+    for entry in sites:
+        if isinstance(entry, str):
+            entry = {'url': entry}
+        site_url = entry.get('url') if isinstance(entry, dict) else None
+        site_url = site_url.strip() if isinstance(site_url, str) else ''
+        if not site_url:
+            return jsonify({'error': 'Every site needs a URL'}), 400
+        site_options = entry.get('options', {})
+        if not isinstance(site_options, dict):
+            return jsonify({'error': f"options of {site_url} must be an object"}), 400
+        entries.append((site_url, {**default_options, **site_options}))
+    
+    # Make room before starting new jobs
+    retention.request_sweep()
+    
+    batch_id = str(uuid.uuid4())[:8]
+    job_ids = []
+    for site_url, options in entries:
+        job_id = create_job(site_url, options)
+        conversion_jobs[job_id]['batch_id'] = batch_id
+        job_ids.append(job_id)
+    
+    batch_jobs[batch_id] = {
+        'id': batch_id,
         'status': 'queued',
         'created_at': datetime.now().isoformat(),
-        'options': data.get('options', {})
+        'concurrency': max(1, min(concurrency, MAX_BATCH_CONCURRENCY)),
+        'browsers': MAX_BATCH_BROWSERS,
+        'job_ids': job_ids
     }
     
-    # Start conversion in background thread
-    thread = threading.Thread(
-        target=convert_website_task,
-        args=(job_id, site_url, data.get('options', {}))
-    )
-    thread.daemon = True
-    thread.start()
+    if broker is not None:
+        # Workers pick the sites up individually
+        batch_jobs[batch_id]['status'] = 'running'
+        for job_id in job_ids:
+            start_job(job_id)
+    else:
+        thread = threading.Thread(target=convert_batch_task, args=(batch_id,))
+        thread.daemon = True
+        thread.start()
     
-    return jsonify({'job_id': job_id, 'status': 'started'})
+    return jsonify({'batch_id': batch_id, 'job_ids': job_ids, 'status': 'started'})
+
+
+@app.route('/batch/<batch_id>')
+def batch_status(batch_id):
+    """Get per-site status and aggregate report of a batch"""
+    if batch_id not in batch_jobs:
+        return jsonify({'error': 'Batch not found'}), 404
+    
+    batch = batch_jobs[batch_id]
+    jobs = [conversion_jobs[job_id] for job_id in batch['job_ids']]
+    counts = {}
+    for job in jobs:
+        counts[job['status']] = counts.get(job['status'], 0) + 1
+    
+    if batch['status'] == 'running' and all(job['status'] not in ('queued', 'running') for job in jobs):
+        batch['status'] = 'completed'
+    
+    return jsonify({
+        **batch,
+        'total': len(jobs),
+        'counts': counts,
+        'sites': [{
+            'job_id': job['id'],
+            'url': job['url'],
+            'status': job['status'],
+            'error': job.get('error'),
+            'download': f"/download/{job['id']}" if job['status'] == 'completed' else None
+        } for job in jobs]
+    })
 
 
 @app.route('/status/<job_id>')
@@ -185,36 +435,81 @@ def job_status(job_id):
     if job_id not in conversion_jobs:
         return jsonify({'error': 'Job not found'}), 404
     
-    return jsonify(conversion_jobs[job_id])
+    job = dict(conversion_jobs[job_id])
+    if job['status'] == 'completed':
+        report = load_job_report(OUTPUT_DIR, job_id)
+        if report is not None:
+            job['crawl_report'] = report
+    return jsonify(job)
+
+
+def parse_number(value, cast=int):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def format_sse(event):
+    """Format a bus event as a Server-Sent Event, one data line per message line"""
+    data = '\ndata: '.join(str(event['data']).splitlines() or [''])
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
 
 
 @app.route('/stream/<job_id>')
 def stream(job_id):
-    """Stream progress updates for a job"""
+    """
+    Stream progress updates for a job as Server-Sent Events.
+    Any number of clients can watch a job; a reconnecting EventSource sends
+    Last-Event-ID and resumes after it. Each response ends after
+    STREAM_MAX_SECONDS so a watcher does not hold a worker thread for the whole job.
+    Unknown jobs, and closed jobs with nothing left to send, get a 204 so EventSource
+    stops reconnecting. /events is the supported delivery path, this is a convenience.
+    """
+    last_id = parse_number(request.headers.get('Last-Event-ID', request.args.get('last_event_id')))
+
+    pending, closed = event_bus.events_after(job_id, last_id)
+    if closed and not pending:
+        return Response(status=204)
+
     def generate():
-        msg_queue = message_queues.get(job_id)
-        if not msg_queue:
-            yield f"data: Job not found\n\n"
-            return
-        
-        while True:
-            try:
-                message = msg_queue.get(timeout=30)
-                yield f"data: {message}\n\n"
-                
-                # Check if job is complete
-                if job_id in conversion_jobs:
-                    status = conversion_jobs[job_id].get('status')
-                    if status in ['completed', 'failed']:
-                        break
-            except queue.Empty:
-                yield f"data: Waiting...\n\n"
-                if job_id in conversion_jobs:
-                    status = conversion_jobs[job_id].get('status')
-                    if status in ['completed', 'failed']:
-                        break
-    
-    return Response(generate(), mimetype='text/event-stream')
+        nonlocal last_id
+        yield "retry: 1000\n\n"
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            events, closed = event_bus.wait(job_id, last_id, timeout=STREAM_KEEPALIVE_SECONDS)
+            if not events and not closed:
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                last_id = event['id']
+                yield format_sse(event)
+            if closed:
+                break
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/events/<job_id>')
+def events(job_id):
+    """
+    Long-poll progress updates for a job.
+    Returns the events after ?after=<id>, waiting up to ?timeout seconds
+    (default 0, returns immediately) for new ones.
+    """
+    if not event_bus.exists(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+
+    last_id = parse_number(request.args.get('after'))
+    timeout = min(max(parse_number(request.args.get('timeout'), float), 0), LONG_POLL_MAX_SECONDS)
+    job_events, closed = event_bus.wait(job_id, last_id, timeout=timeout)
+
+    return jsonify({
+        'events': job_events,
+        'closed': closed,
+        'last_id': job_events[-1]['id'] if job_events else last_id,
+        'status': conversion_jobs.get(job_id, {}).get('status')
+    })
 
 
 @app.route('/download/<job_id>')
@@ -225,6 +520,9 @@ def download(job_id):
     
     job = conversion_jobs[job_id]
     
+    if job['status'] == 'expired':
+        return jsonify({'error': 'Download has expired, please convert the site again'}), 410
+    
     if job['status'] != 'completed':
         return jsonify({'error': 'Conversion not complete'}), 400
     
@@ -232,11 +530,19 @@ def download(job_id):
     if not zip_path or not os.path.exists(zip_path):
         return jsonify({'error': 'Download file not found'}), 404
     
-    return send_file(
-        zip_path,
-        as_attachment=True,
-        download_name=job.get('zip_filename', 'website.zip')
-    )
+    # Protect the file from eviction while it is being sent
+    retention.download_started(job_id)
+    try:
+        response = send_file(
+            zip_path,
+            as_attachment=True,
+            download_name=job.get('zip_filename', 'website.zip')
+        )
+    except Exception:
+        retention.download_finished(job_id)
+        raise
+    response.call_on_close(lambda: retention.download_finished(job_id))
+    return response
 
 
 @app.route('/jobs')
@@ -245,6 +551,80 @@ def list_jobs():
     return jsonify(list(conversion_jobs.values()))
 
 
+@app.route('/healthz')
+def healthz():
+    """Liveness check that doesn't touch the scraper, the broker or the disk"""
+    return jsonify({
+        'status': 'ok',
+        'uptime_seconds': round(time.monotonic() - APP_IMPORT_STARTED, 1),
+        'import_seconds': round(APP_IMPORT_SECONDS, 3),
+        'scraper_loaded': 'wixscraper' in sys.modules,
+        'mode': 'broker' if broker is not None else 'local',
+        'jobs': len(conversion_jobs)
+    })
+
+
+# Broker operations remote workers may call, see broker.HTTPBroker
+BROKER_OPERATIONS = ('claim', 'heartbeat', 'publish', 'complete', 'fail')
+
+
+@app.route('/broker/<operation>', methods=['POST'])
+def broker_operation(operation):
+    """Run a broker operation for a worker on another host"""
+    token = app.config['BROKER_TOKEN']
+    if broker is None or not token or operation not in BROKER_OPERATIONS:
+        return jsonify({'error': 'Not found'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Broker-Token', ''), token):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    params = request.get_json(silent=True)
+    if not isinstance(params, dict):
+        return jsonify({'error': 'Parameters must be a JSON object'}), 400
+    try:
+        result = getattr(broker, operation)(**params)
+    except TypeError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'result': result})
+
+
+def admin_error():
+    """Error response for an admin request, None when it may proceed"""
+    token = app.config['ADMIN_TOKEN']
+    if not token:
+        # The admin endpoints are off unless ADMIN_TOKEN is set
+        return jsonify({'error': 'Not found'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return None
+
+
+@app.route('/admin/disk')
+def admin_disk():
+    """Report disk usage of converted sites"""
+    error = admin_error()
+    if error is not None:
+        return error
+    
+    return jsonify(retention.usage())
+
+
+@app.route('/admin/cleanup', methods=['POST'])
+def admin_cleanup():
+    """Run the retention sweep now"""
+    error = admin_error()
+    if error is not None:
+        return error
+    
+    evicted = retention.sweep()
+    return jsonify({'evicted': evicted, 'usage': retention.usage()})
+
+
+if broker is not None and __name__ != '__mp_main__':
+    threading.Thread(target=sync_broker, daemon=True).start()
+
+APP_IMPORT_SECONDS = time.monotonic() - APP_IMPORT_STARTED
+
+
 if __name__ == '__main__':
     print("=" * 50)
     print("Wix to Offline Converter")
@@ -0,0 +1,229 @@
+# Asset cache - persistent HTTP cache for images, fonts, stylesheets and scripts
+# Shared between pages, jobs and batch runs. Stored responses keep their validators
+# (ETag / Last-Modified) and are revalidated with conditional requests once stale,
+# so re-converting a site mostly costs 304 round trips.
+
+import asyncio
+import email.utils
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from ratelimit import limited_get
+
+# Response headers kept with a cached body and replayed to the browser
+STORED_HEADERS = ('content-type', 'access-control-allow-origin', 'timing-allow-origin',
+                  'cache-control', 'etag', 'last-modified', 'expires')
+
+# Browser requests served from the cache
+CACHED_RESOURCE_TYPES = ('image', 'font', 'stylesheet', 'script')
+
+# Longest heuristic freshness for responses without explicit expiry
+MAX_HEURISTIC_SECONDS = 24 * 3600
+
+
+def parse_cache_control(value):
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"')
+    return directives
+
+
+def parse_http_date(value):
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers, now):
+    """Seconds a response may be used without revalidation"""
+    directives = parse_cache_control(headers.get('cache-control'))
+    if 'no-cache' in directives:
+        return 0
+    if 'max-age' in directives:
+        try:
+            return max(int(directives['max-age']) - int(headers.get('age', 0) or 0), 0)
+        except ValueError:
+            return 0
+    expires = parse_http_date(headers.get('expires'))
+    if expires is not None:
+        return max(expires - now, 0)
+    last_modified = parse_http_date(headers.get('last-modified'))
+    if last_modified is not None:
+        # Heuristic freshness (RFC 9111 4.2.2)
+        return min((now - last_modified) / 10, MAX_HEURISTIC_SECONDS)
+    return 0
+
+
+class AssetCache:
+    """
+    Directory of HTTP responses keyed by url (and Accept header, which Wix uses
+    to pick image formats). Safe to share between threads and jobs; files are
+    written atomically. The least recently used entries are evicted once the
+    cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._size = sum(os.path.getsize(path) for path in self.entries())
+
+    def path(self, url, accept=''):
+        key = hashlib.sha1((url + '\n' + (accept or '')).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def entries(self):
+        for root, dirs, files in os.walk(self.cache_dir):
+            for file in files:
+                if not file.endswith('.json') and not file.startswith('tmp'):
+                    yield os.path.join(root, file)
+
+    def write(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        try:
+            with open(path + '.json', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        # Mark as recently used for eviction
+        os.utime(path)
+        return meta, body
+
+    def store(self, path, url, response, body, now):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        meta = {
+            'url': url,
+            'status': response.status_code,
+            'headers': headers,
+            'stored_at': now,
+            'fresh_until': now + freshness_lifetime(headers, now)
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        self.write(path, body)
+        self.write(path + '.json', json.dumps(meta).encode('utf-8'))
+        with self._lock:
+            self._size += len(body) - old_size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+        return meta
+
+    def refresh(self, path, meta, response, now):
+        # A 304 carries updated freshness information for the stored response
+        for name in STORED_HEADERS:
+            if name in response.headers and name != 'content-type':
+                meta['headers'][name] = response.headers[name]
+        meta['fresh_until'] = now + freshness_lifetime(meta['headers'], now)
+        self.write(path + '.json', json.dumps(meta).encode('utf-8'))
+        return meta
+
+    def evict(self):
+        """Delete least recently used entries until the cache is back under 90% of max_bytes"""
+        with self._lock:
+            files = []
+            for path in self.entries():
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            self._size = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if self._size <= self.max_bytes * 0.9:
+                    break
+                for name in (path, path + '.json'):
+                    try:
+                        os.remove(name)
+                    except OSError:
+                        pass
+                self._size -= size
+
+    def request(self, url, accept='', timeout=60, budget=None):
+        """
+        GET a url through the cache.
+        Returns (status, headers, body); only successful responses are cached.
+        Only bodies that came from the origin count towards budget.
+        """
+        path = self.path(url, accept)
+        meta, body = self.load(path)
+        now = time.time()
+
+        if meta is not None and now < meta['fresh_until']:
+            return meta['status'], meta['headers'], body
+
+        request_headers = {'Accept': accept} if accept else {}
+        if meta is not None:
+            if 'etag' in meta['headers']:
+                request_headers['If-None-Match'] = meta['headers']['etag']
+            if 'last-modified' in meta['headers']:
+                request_headers['If-Modified-Since'] = meta['headers']['last-modified']
+
+        r = limited_get(url, headers=request_headers, allow_redirects=True, timeout=timeout)
+        if budget is not None:
+            budget.add_bytes(len(r.content))
+
+        if r.status_code == 304 and meta is not None:
+            meta = self.refresh(path, meta, r, now)
+            return meta['status'], meta['headers'], body
+
+        if r.status_code == 200 and 'no-store' not in parse_cache_control(r.headers.get('cache-control')):
+            meta = self.store(path, url, r, r.content, now)
+            return r.status_code, meta['headers'], r.content
+
+        headers = {name: r.headers[name] for name in STORED_HEADERS if name in r.headers}
+        return r.status_code, headers, r.content
+
+    def fetch(self, url, timeout=60, budget=None):
+        status, headers, body = self.request(url, timeout=timeout, budget=budget)
+        if status >= 400:
+            raise requests.HTTPError(f"{status} Error for url: {url}")
+        return body
+
+
+def fetch_asset(url, cache=None, timeout=60, budget=None):
+    """Download an asset, through the cache if there is one. Network bytes count towards budget."""
+    if cache is not None:
+        return cache.fetch(url, timeout=timeout, budget=budget)
+    r = limited_get(url, allow_redirects=True, timeout=timeout)
+    if budget is not None:
+        budget.add_bytes(len(r.content))
+    r.raise_for_status()
+    return r.content
+
+
+async def route_through_cache(context, cache, budget=None):
+    """Serve the static requests of a browser context from the cache"""
+    async def handle(route):
+        request = route.request
+        if request.method != 'GET' or request.resource_type not in CACHED_RESOURCE_TYPES \
+                or not request.url.startswith('http'):
+            await route.continue_()
+            return
+        try:
+            status, headers, body = await asyncio.to_thread(
+                cache.request, request.url, request.headers.get('accept', ''), budget=budget)
+        except Exception:
+            await route.continue_()
+            return
+        await route.fulfill(status=status, headers=headers, body=body)
+
+    await context.route('**/*', handle)
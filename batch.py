@@ -0,0 +1,164 @@
+# Batch conversion - converts many Wix sites in one run
+# Sites share a small pool of browsers and one asset cache.
+#
+# Usage: python batch.py sites.json [--output-dir output] [--concurrency 2] [--browsers 1]
+#
+# sites.json is a list of site configs using the config.json keys, e.g.
+#   [{"site": "https://a.wixsite.com/a", "recursive": "True"}, "https://b.wixsite.com/b"]
+# or {"defaults": {...}, "sites": [...]}. A plain text file with one URL per line works too.
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+from playwright.async_api import async_playwright
+
+from assetcache import AssetCache
+from budget import JobBudget
+from wixscraper import scrape_wix_site, launch_browser
+
+CONFIG_FLAGS = ('recursive', 'darkWebsite', 'forceDownloadAgain', 'staticRender', 'subsetFonts', 'optimizeOutput',
+                'localizeMedia', 'cheapFirstFixers')
+CONFIG_KEYS = ('blockPrimaryFolder', 'wait', 'metatags', 'mapData', 'disabledFixers') + CONFIG_FLAGS
+
+
+def as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() == 'true'
+    return bool(value)
+
+
+def load_sites(path):
+    """Read a batch file, returning a list of site configs"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = [line.strip() for line in text.splitlines() if line.strip() and not line.startswith('#')]
+
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get('defaults', {})
+        data = data.get('sites', [])
+
+    sites = []
+    for entry in data:
+        if isinstance(entry, str):
+            entry = {'site': entry}
+        sites.append({**defaults, **entry})
+    return sites
+
+
+def config_to_kwargs(config):
+    """Turn a config.json style site entry into scrape_wix_site arguments"""
+    kwargs = {'site': config['site']}
+    for key in CONFIG_KEYS:
+        if key in config:
+            kwargs[key] = as_bool(config[key]) if key in CONFIG_FLAGS else config[key]
+    if 'wait' in kwargs:
+        kwargs['wait'] = int(kwargs['wait'])
+    kwargs['budget'] = JobBudget.from_options(config)
+    return kwargs
+
+
+async def run_batch(sites, output_dir='output', concurrency=2, browsers=1, cache_dir=None,
+                    progress_callback=None, on_site_done=None, cache=None, cache_mb=1024):
+    """
+    Convert a list of sites, given as scrape_wix_site keyword arguments.
+    A site's own output_dir and progress_callback take precedence over the batch ones.
+    on_site_done(index, result) is called from a worker thread as each site finishes.
+    Pass an existing AssetCache as cache, or cache_dir / cache_mb to create one.
+    Returns the aggregate report.
+    """
+    assetCache = cache
+    if assetCache is None:
+        if cache_dir is None:
+            cache_dir = os.path.join(output_dir, '.asset-cache')
+        assetCache = AssetCache(cache_dir, max_bytes=int(cache_mb * 1024 * 1024))
+    semaphore = asyncio.Semaphore(concurrency)
+    results = [None] * len(sites)
+    started = time.time()
+
+    async with async_playwright() as p:
+        browser_pool = [await launch_browser(p) for _ in range(max(1, min(browsers, len(sites))))]
+
+        async def run_site(index, kwargs):
+            kwargs = dict(kwargs)
+            site = kwargs['site']
+            kwargs.setdefault('output_dir', output_dir)
+            if progress_callback and 'progress_callback' not in kwargs:
+                kwargs['progress_callback'] = lambda message: progress_callback(index, message)
+
+            async with semaphore:
+                result = {'index': index, 'site': site, 'status': 'running',
+                          'started_at': datetime.now().isoformat()}
+                site_started = time.time()
+                try:
+                    result['output_path'] = await scrape_wix_site(
+                        browser=browser_pool[index % len(browser_pool)],
+                        assetCache=assetCache,
+                        **kwargs
+                    )
+                    result['status'] = 'completed'
+                    if kwargs.get('budget') is not None and kwargs['budget'].limited():
+                        result['budget'] = kwargs['budget'].report()
+                except Exception as e:
+                    result['status'] = 'failed'
+                    result['error'] = str(e)
+                    print(f"[batch] {site} failed: {e}")
+                result['seconds'] = round(time.time() - site_started, 1)
+                result['finished_at'] = datetime.now().isoformat()
+
+            if on_site_done:
+                await asyncio.to_thread(on_site_done, index, result)
+            results[index] = result
+
+        try:
+            await asyncio.gather(*(run_site(i, kwargs) for i, kwargs in enumerate(sites)))
+        finally:
+            for browser in browser_pool:
+                await browser.close()
+
+    report = {
+        'total': len(sites),
+        'completed': sum(1 for r in results if r and r['status'] == 'completed'),
+        'failed': sum(1 for r in results if r and r['status'] == 'failed'),
+        'seconds': round(time.time() - started, 1),
+        'sites': results
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert many Wix sites in one run')
+    parser.add_argument('sites', help='JSON list of site configs, or a text file with one URL per line')
+    parser.add_argument('--output-dir', default='output')
+    parser.add_argument('--concurrency', type=int, default=2, help='sites converted at the same time')
+    parser.add_argument('--browsers', type=int, default=1, help='browser instances shared by the sites')
+    parser.add_argument('--cache-dir', default=None, help='shared HTTP cache (default: <output-dir>/.asset-cache)')
+    parser.add_argument('--cache-mb', type=float, default=1024, help='size limit of the HTTP cache')
+    args = parser.parse_args()
+
+    sites = [config_to_kwargs(config) for config in load_sites(args.sites)]
+
+    def progress(index, message):
+        print(f"[{index + 1}/{len(sites)}] {message}")
+
+    report = asyncio.run(run_batch(sites, args.output_dir, args.concurrency, args.browsers, args.cache_dir,
+                                   progress_callback=progress, cache_mb=args.cache_mb))
+
+    report_path = os.path.join(args.output_dir, 'batch_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4)
+
+    print(f"Converted {report['completed']} of {report['total']} sites in {report['seconds']}s "
+          f"({report['failed']} failed). Report: {report_path}")
+
+
+if __name__ == '__main__':
+    main()
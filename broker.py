@@ -0,0 +1,266 @@
+"""
+Job broker for distributed workers
+The web app only enqueues conversion jobs; standalone workers (worker.py)
+claim them, publish progress and report their results back through the broker.
+The SQLite database lives on the web app's host; workers on other hosts reach it
+through the app's /broker endpoints (HTTPBroker).
+"""
+
+import json
+import os
+import sqlite3
+import time
+import urllib.request
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# A claimed job whose worker stops renewing its lease for this long is handed to another worker
+LEASE_SECONDS = 120
+# A job is failed instead of claimed again once this many workers took it without finishing it
+MAX_ATTEMPTS = int(os.environ.get('BROKER_MAX_ATTEMPTS', 3))
+
+
+class Broker:
+    """Interface of a job broker backend"""
+
+    def enqueue(self, job_id, payload):
+        """Add a job for the workers"""
+        raise NotImplementedError
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        """
+        Take the oldest queued (or abandoned) job, returns {'id', 'payload'} or None.
+        Abandoned jobs that already had max_attempts are failed instead.
+        """
+        raise NotImplementedError
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+        """Renew the lease of a running job, returns False when worker_id no longer holds it"""
+        raise NotImplementedError
+
+    def publish(self, job_id, data, event='message'):
+        """Append a progress event to a job"""
+        raise NotImplementedError
+
+    def complete(self, job_id, worker_id, result):
+        """Record the result of a job, returns False when worker_id no longer holds it"""
+        raise NotImplementedError
+
+    def fail(self, job_id, worker_id, error):
+        raise NotImplementedError
+
+    def get(self, job_id):
+        """Return {'id', 'status', 'payload', 'result', 'error', 'worker'} or None"""
+        raise NotImplementedError
+
+    def events_since(self, cursor=0, limit=500):
+        """Progress events of all jobs after cursor, returns (events, new cursor)"""
+        raise NotImplementedError
+
+    def prune(self, max_age_seconds):
+        """Forget finished jobs and their events older than max_age_seconds"""
+        raise NotImplementedError
+
+
+class SQLiteBroker(Broker):
+    """
+    Broker backed by a single SQLite file on a local disk, for the web app and
+    workers on the same host. Needs no external services. SQLite's WAL mode and
+    locking don't work over network filesystems, so never share the file between hosts.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with self.connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    worker TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+                CREATE TABLE IF NOT EXISTS events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT,
+                    created REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS events_job ON events (job_id);
+            ''')
+
+    @contextmanager
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def transaction(self):
+        # Take the write lock up front so concurrent workers serialize here
+        with self.connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                yield db
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+
+    def enqueue(self, job_id, payload):
+        now = time.time()
+        with self.connect() as db:
+            db.execute('INSERT INTO jobs (id, payload, status, created, updated) VALUES (?, ?, ?, ?, ?)',
+                       (job_id, json.dumps(payload), 'queued', now, now))
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        now = time.time()
+        with self.transaction() as db:
+            while True:
+                row = db.execute('''
+                    SELECT id, payload, attempts FROM jobs
+                    WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)
+                    ORDER BY created LIMIT 1
+                ''', (now,)).fetchone()
+                if row is None:
+                    return None
+                if row['attempts'] < max_attempts:
+                    break
+                # Every worker that took this job died or lost it, don't hand it out again
+                error = f"Gave up after {row['attempts']} attempts (worker lost)"
+                db.execute('''UPDATE jobs SET status = 'failed', error = ?, worker = NULL, lease_until = NULL,
+                                              updated = ? WHERE id = ?''', (error, now, row['id']))
+                db.execute('INSERT INTO events (job_id, event, data, created) VALUES (?, ?, ?, ?)',
+                           (row['id'], 'end', 'failed', now))
+            db.execute('''
+                UPDATE jobs SET status = 'running', worker = ?, lease_until = ?,
+                                attempts = attempts + 1, updated = ?
+                WHERE id = ?
+            ''', (worker_id, now + lease_seconds, now, row['id']))
+        return {'id': row['id'], 'payload': json.loads(row['payload'])}
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        with self.connect() as db:
+            cursor = db.execute('''UPDATE jobs SET lease_until = ?, updated = ?
+                                   WHERE id = ? AND worker = ? AND status = 'running' ''',
+                                (now + lease_seconds, now, job_id, worker_id))
+        return cursor.rowcount > 0
+
+    def publish(self, job_id, data, event='message'):
+        with self.connect() as db:
+            db.execute('INSERT INTO events (job_id, event, data, created) VALUES (?, ?, ?, ?)',
+                       (job_id, event, data, time.time()))
+
+    def _finish(self, job_id, worker_id, status, result=None, error=None):
+        # Only the worker holding the job may finish it, a worker whose lease expired is ignored
+        now = time.time()
+        with self.transaction() as db:
+            cursor = db.execute('''UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated = ?
+                                   WHERE id = ? AND worker = ? AND status = 'running' ''',
+                                (status, json.dumps(result) if result is not None else None, error, now,
+                                 job_id, worker_id))
+            if cursor.rowcount == 0:
+                return False
+            db.execute('INSERT INTO events (job_id, event, data, created) VALUES (?, ?, ?, ?)',
+                       (job_id, 'end', status, now))
+        return True
+
+    def complete(self, job_id, worker_id, result):
+        return self._finish(job_id, worker_id, 'completed', result=result)
+
+    def fail(self, job_id, worker_id, error):
+        return self._finish(job_id, worker_id, 'failed', error=str(error))
+
+    def get(self, job_id):
+        with self.connect() as db:
+            row = db.execute('SELECT id, status, payload, result, error, worker FROM jobs WHERE id = ?',
+                             (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'payload': json.loads(row['payload']),
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'worker': row['worker']
+        }
+
+    def events_since(self, cursor=0, limit=500):
+        with self.connect() as db:
+            rows = db.execute('SELECT seq, job_id, event, data FROM events WHERE seq > ? ORDER BY seq LIMIT ?',
+                              (cursor, limit)).fetchall()
+        events = [dict(row) for row in rows]
+        return events, events[-1]['seq'] if events else cursor
+
+    def prune(self, max_age_seconds):
+        cutoff = time.time() - max_age_seconds
+        with self.transaction() as db:
+            db.execute('''DELETE FROM events WHERE job_id IN
+                          (SELECT id FROM jobs WHERE status IN ('completed', 'failed') AND updated < ?)''', (cutoff,))
+            db.execute("DELETE FROM jobs WHERE status IN ('completed', 'failed') AND updated < ?", (cutoff,))
+
+
+class HTTPBroker(Broker):
+    """
+    Worker side of the broker served by the web app (POST /broker/<operation>),
+    for workers on other hosts. Only the operations workers use are supported.
+    """
+
+    def __init__(self, url, token='', timeout=30):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+
+    def call(self, operation, **params):
+        request = urllib.request.Request(f"{self.url}/{operation}", data=json.dumps(params).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json', 'X-Broker-Token': self.token})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())['result']
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        return self.call('claim', worker_id=worker_id, lease_seconds=lease_seconds, max_attempts=max_attempts)
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+        return self.call('heartbeat', job_id=job_id, worker_id=worker_id, lease_seconds=lease_seconds)
+
+    def publish(self, job_id, data, event='message'):
+        return self.call('publish', job_id=job_id, data=data, event=event)
+
+    def complete(self, job_id, worker_id, result):
+        return self.call('complete', job_id=job_id, worker_id=worker_id, result=result)
+
+    def fail(self, job_id, worker_id, error):
+        return self.call('fail', job_id=job_id, worker_id=worker_id, error=str(error))
+
+
+def get_broker(url, token=None):
+    """
+    Create the broker for a BROKER_URL.
+    Supported: sqlite:///relative/path.db, sqlite:////absolute/path.db (same host only)
+    and, for workers, http(s)://<web app>/broker (token: $BROKER_TOKEN)
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 'sqlite':
+        path = url[len('sqlite:///'):]
+        if not path:
+            raise ValueError('BROKER_URL needs a database path, e.g. sqlite:///broker.db')
+        return SQLiteBroker(path)
+    if parsed.scheme in ('http', 'https'):
+        return HTTPBroker(url, token if token is not None else os.environ.get('BROKER_TOKEN', ''))
+    raise ValueError(f"Unsupported broker: {url}")
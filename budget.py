@@ -0,0 +1,148 @@
+# Job budgets - limits on the time, pages, downloaded bytes and browser memory of a job
+# When a limit is reached the crawl stops queueing new pages, the page in progress is
+# finished and the pages converted so far are packaged as a partial result, together
+# with budget_report.json listing what was skipped.
+
+import json
+import os
+import threading
+import time
+
+# Server-wide limits (0 = unlimited); a job can ask for lower ones in its options
+SERVER_LIMITS = {
+    'maxMinutes': float(os.environ.get('JOB_MAX_MINUTES', 0)),
+    'maxPages': float(os.environ.get('JOB_MAX_PAGES', 0)),
+    'maxDownloadMb': float(os.environ.get('JOB_MAX_DOWNLOAD_MB', 0)),
+    'maxMemoryMb': float(os.environ.get('JOB_MAX_MEMORY_MB', 0))
+}
+
+REPORT_FILE = 'budget_report.json'
+
+
+def effective_limit(requested, server):
+    # The lower of the two limits, where 0 or missing means unlimited
+    try:
+        requested = float(requested or 0)
+    except (TypeError, ValueError):
+        requested = 0
+    limits = [limit for limit in (requested, server) if limit > 0]
+    return min(limits) if limits else 0
+
+
+class JobBudget:
+    """
+    Usage counters and limits of one job. Limits of 0 are unlimited.
+    add_bytes() may be called from download threads.
+    """
+
+    def __init__(self, max_seconds=0, max_pages=0, max_bytes=0, max_memory_mb=0):
+        self.max_seconds = max_seconds
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.max_memory_mb = max_memory_mb
+        self.started = time.monotonic()
+        self.pages = 0
+        self.bytes = 0
+        self.peak_memory_mb = 0
+        self.exceeded = None
+        self.skipped = []
+        self._lock = threading.Lock()
+        self._cdp = None
+
+    @classmethod
+    def from_options(cls, options):
+        """Budget from job options (maxMinutes, maxPages, maxDownloadMb, maxMemoryMb) and the server limits"""
+        limits = {key: effective_limit(options.get(key), server) for key, server in SERVER_LIMITS.items()}
+        return cls(
+            max_seconds=limits['maxMinutes'] * 60,
+            max_pages=int(limits['maxPages']),
+            max_bytes=int(limits['maxDownloadMb'] * 1024 * 1024),
+            max_memory_mb=limits['maxMemoryMb']
+        )
+
+    def start(self):
+        # The clock runs from the start of the crawl, not from when the job was queued
+        self.started = time.monotonic()
+
+    def limited(self):
+        return bool(self.max_seconds or self.max_pages or self.max_bytes or self.max_memory_mb)
+
+    def seconds(self):
+        return time.monotonic() - self.started
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes += count
+
+    def add_response(self, response):
+        # Size of a browser response, as announced by the server
+        length = response.headers.get('content-length', '')
+        if length.isdigit():
+            self.add_bytes(int(length))
+
+    def count_responses(self, context, skip_types=()):
+        """Count the responses of a browser context, except requests of skip_types (answered by a route)"""
+        def on_response(response):
+            if response.request.resource_type not in skip_types:
+                self.add_response(response)
+
+        context.on('response', on_response)
+
+    def page_done(self):
+        self.pages += 1
+
+    def skip(self, link):
+        if link not in self.skipped:
+            self.skipped.append(link)
+
+    def check(self):
+        """Return why the budget is exhausted, or None while there is budget left"""
+        if self.exceeded is None:
+            if self.max_seconds and self.seconds() >= self.max_seconds:
+                self.exceeded = f"time limit of {self.max_seconds / 60:g} minutes"
+            elif self.max_pages and self.pages >= self.max_pages:
+                self.exceeded = f"page limit of {self.max_pages} pages"
+            elif self.max_bytes and self.bytes >= self.max_bytes:
+                self.exceeded = f"download limit of {self.max_bytes / 1024 / 1024:g} MB"
+            elif self.max_memory_mb and self.peak_memory_mb >= self.max_memory_mb:
+                self.exceeded = f"browser memory limit of {self.max_memory_mb:g} MB"
+        return self.exceeded
+
+    async def check_memory(self, page):
+        # JS heap of the page, read through the Chrome DevTools Protocol
+        if not self.max_memory_mb:
+            return
+        try:
+            if self._cdp is None or self._cdp[0] is not page:
+                session = await page.context.new_cdp_session(page)
+                await session.send('Performance.enable')
+                self._cdp = (page, session)
+            metrics = (await self._cdp[1].send('Performance.getMetrics'))['metrics']
+        except Exception as e:
+            print(f"Could not read browser memory: {e}")
+            return
+        heap = next((metric['value'] for metric in metrics if metric['name'] == 'JSHeapTotalSize'), 0)
+        self.peak_memory_mb = max(self.peak_memory_mb, heap / 1024 / 1024)
+
+    def report(self):
+        return {
+            'partial': self.exceeded is not None,
+            'exceeded': self.exceeded,
+            'limits': {
+                'seconds': self.max_seconds or None,
+                'pages': self.max_pages or None,
+                'bytes': self.max_bytes or None,
+                'memory_mb': self.max_memory_mb or None
+            },
+            'used': {
+                'seconds': round(self.seconds(), 1),
+                'pages': self.pages,
+                'bytes': self.bytes,
+                'peak_memory_mb': round(self.peak_memory_mb, 1)
+            },
+            'skipped': self.skipped
+        }
+
+    def write_report(self, output_path):
+        with open(os.path.join(output_path, REPORT_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=4)
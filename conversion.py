@@ -0,0 +1,95 @@
+"""
+Conversion job helpers shared by the web app and standalone workers
+"""
+
+import os
+import zipfile
+from urllib.parse import urlparse
+
+from budget import JobBudget
+
+
+def scrape_options(site_url, options):
+    """Translate web UI options into scrape_wix_site arguments"""
+    # Parse options
+    block_primary_folder = options.get('blockPrimaryFolder', '')
+    wait_time = int(options.get('wait', 3))
+    recursive = options.get('recursive', False)
+    dark_website = options.get('darkWebsite', False)
+    force_download = options.get('forceDownload', False)
+    static_render = options.get('staticRender', False)
+    subset_fonts = options.get('subsetFonts', False)
+    optimize_output = options.get('optimizeOutput', False)
+    localize_media = options.get('localizeMedia', False)
+    disabled_fixers = options.get('disabledFixers', [])
+    cheap_first_fixers = options.get('cheapFirstFixers', False)
+
+    # Build metatags
+    metatags = {
+        '/': {
+            'title': options.get('title', 'Website'),
+            'description': options.get('description', ''),
+            'keywords': options.get('keywords', ''),
+            'canonical': site_url,
+            'image': options.get('image', ''),
+            'author': options.get('author', '')
+        }
+    }
+
+    # Build mapData
+    mapData = {
+        'latitude': options.get('mapLatitude', '0'),
+        'longitude': options.get('mapLongitude', '0'),
+        'zoom': options.get('mapZoom', '12'),
+        'mapMarker': {
+            'latitude': options.get('mapMarkerLatitude', options.get('mapLatitude', '0')),
+            'longitude': options.get('mapMarkerLongitude', options.get('mapLongitude', '0')),
+            'popup': options.get('mapPopup', '')
+        }
+    }
+
+    return {
+        'site': site_url,
+        'blockPrimaryFolder': block_primary_folder,
+        'wait': wait_time,
+        'recursive': recursive,
+        'darkWebsite': dark_website,
+        'forceDownloadAgain': force_download,
+        'metatags': metatags,
+        'mapData': mapData,
+        'staticRender': static_render,
+        'subsetFonts': subset_fonts,
+        'optimizeOutput': optimize_output,
+        'localizeMedia': localize_media,
+        'disabledFixers': disabled_fixers,
+        'cheapFirstFixers': cheap_first_fixers,
+        'budget': JobBudget.from_options(options)
+    }
+
+
+def job_output_dir(output_dir, job_id):
+    """Create and return the output directory of a job"""
+    path = os.path.join(output_dir, job_id)
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return path
+
+
+def package_site(output_dir, job_id, site_url, output_path):
+    """
+    Create the ZIP archive of a scraped site.
+    Returns the archive path and download file name.
+    """
+    hostname = urlparse(site_url).hostname
+    zip_filename = f"{hostname}_{job_id}.zip"
+    zip_path = os.path.join(output_dir, zip_filename)
+    base_dir = os.path.join(output_dir, job_id)
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for root, dirs, files in os.walk(output_path):
+            for file in files:
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, base_dir)
+                zipf.write(file_path, arcname)
+
+    return zip_path, zip_filename
@@ -0,0 +1,185 @@
+# Crawl report - what a crawl found and what each page cost
+# Records the link graph, how every page was rendered, its render and wait times,
+# the assets and bytes it pulled in and the history of failed attempts. Written as
+# crawl_report.json and a crawl_report.html view next to the converted site.
+
+import html
+import json
+import os
+import shutil
+import time
+
+REPORT_FILE = 'crawl_report.json'
+REPORT_HTML_FILE = 'crawl_report.html'
+
+# Pages listed in the summary as the most expensive ones
+SLOWEST_PAGES = 10
+
+
+class CrawlReport:
+    def __init__(self, site):
+        self.site = site
+        self.started = time.time()
+        self.finished = None
+        self.pages = {}
+
+    def page(self, url):
+        if url not in self.pages:
+            self.pages[url] = {
+                'url': url,
+                'status': 'found',
+                'renderer': None,
+                'found_from': {},
+                'links': {},
+                'render_seconds': None,
+                'wait_seconds': None,
+                'images': None,
+                'fonts': None,
+                'bytes': None,
+                'attempts': []
+            }
+        return self.pages[url]
+
+    def add_links(self, source, links):
+        # Dicts keep the links unique and in the order they were found
+        entry = self.page(source)
+        for link in links:
+            entry['links'][link] = True
+            self.page(link)['found_from'][source] = True
+
+    def converted(self, url, renderer, render_seconds, wait_seconds=None, images=None, fonts=None, bytes=None):
+        entry = self.page(url)
+        entry.update({
+            'status': 'converted',
+            'renderer': renderer,
+            'render_seconds': round(render_seconds, 2),
+            'wait_seconds': round(wait_seconds, 2) if wait_seconds is not None else None,
+            'images': images,
+            'fonts': fonts,
+            'bytes': bytes
+        })
+
+    def failed_attempt(self, url, error, gave_up=False):
+        entry = self.page(url)
+        entry['attempts'].append({'error': str(error), 'at_seconds': round(time.time() - self.started, 1)})
+        entry['status'] = 'failed' if gave_up else 'retrying'
+
+    def skipped(self, url):
+        self.page(url)['status'] = 'skipped'
+
+    def finish(self):
+        self.finished = time.time()
+
+    def summary(self):
+        pages = list(self.pages.values())
+        statuses = {}
+        for entry in pages:
+            statuses[entry['status']] = statuses.get(entry['status'], 0) + 1
+        converted = [entry for entry in pages if entry['status'] == 'converted']
+        slowest = sorted(converted, key=lambda entry: entry['render_seconds'], reverse=True)[:SLOWEST_PAGES]
+        return {
+            'site': self.site,
+            'seconds': round((self.finished or time.time()) - self.started, 1),
+            'pages_found': len(pages),
+            'statuses': statuses,
+            'links': sum(len(entry['links']) for entry in pages),
+            'failed_attempts': sum(len(entry['attempts']) for entry in pages),
+            'bytes': sum(entry['bytes'] or 0 for entry in converted),
+            'slowest': [{'url': entry['url'], 'render_seconds': entry['render_seconds']} for entry in slowest]
+        }
+
+    def to_dict(self):
+        pages = []
+        for entry in self.pages.values():
+            entry = dict(entry)
+            entry['found_from'] = list(entry['found_from'])
+            entry['links'] = list(entry['links'])
+            pages.append(entry)
+        return {'summary': self.summary(), 'pages': pages}
+
+    def write(self, output_path):
+        report = self.to_dict()
+        with open(os.path.join(output_path, REPORT_FILE), 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+        with open(os.path.join(output_path, REPORT_HTML_FILE), 'w', encoding='utf-8') as f:
+            f.write(render_html(report))
+        return report
+
+
+def format_cell(value):
+    return '' if value is None else html.escape(str(value))
+
+
+def render_html(report):
+    """Standalone HTML view of a crawl report, most expensive pages first"""
+    summary = report['summary']
+    pages = sorted(report['pages'], key=lambda entry: entry['render_seconds'] or 0, reverse=True)
+
+    rows = []
+    for entry in pages:
+        attempts = '<br>'.join(format_cell(attempt['error']) for attempt in entry['attempts'])
+        links = ''.join(f'<li>{format_cell(link)}</li>' for link in entry['links'])
+        found_from = '<br>'.join(format_cell(link) for link in entry['found_from'])
+        rows.append(
+            f'<tr class="{format_cell(entry["status"])}"><td>{format_cell(entry["url"])}</td>'
+            f'<td>{format_cell(entry["status"])}</td><td>{format_cell(entry["renderer"])}</td>'
+            f'<td>{format_cell(entry["render_seconds"])}</td><td>{format_cell(entry["wait_seconds"])}</td>'
+            f'<td>{format_cell(entry["images"])}</td><td>{format_cell(entry["fonts"])}</td>'
+            f'<td>{format_cell(entry["bytes"])}</td><td>{attempts}</td><td>{found_from}</td>'
+            f'<td><details><summary>{len(entry["links"])}</summary><ul>{links}</ul></details></td></tr>'
+        )
+
+    statuses = ', '.join(f'{count} {format_cell(status)}' for status, count in summary['statuses'].items())
+    return f'''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Crawl report - {format_cell(summary['site'])}</title>
+<style>
+    body {{ font-family: sans-serif; margin: 2em; }}
+    table {{ border-collapse: collapse; font-size: 0.9em; }}
+    th, td {{ border: 1px solid #ddd; padding: 4px 8px; text-align: left; vertical-align: top; }}
+    th {{ background: #f4f4f4; }}
+    tr.failed td {{ background: #fde8e8; }}
+    tr.skipped td, tr.found td {{ color: #888; }}
+</style></head>
+<body>
+<h1>Crawl report</h1>
+<p>{format_cell(summary['site'])}: {summary['pages_found']} pages found ({statuses}) in {summary['seconds']}s,
+{summary['links']} links, {summary['failed_attempts']} failed attempts, {summary['bytes']} bytes downloaded.</p>
+<table>
+<tr><th>Page</th><th>Status</th><th>Renderer</th><th>Render (s)</th><th>Wait (s)</th><th>Images</th>
+<th>Fonts</th><th>Bytes</th><th>Failed attempts</th><th>Found from</th><th>Links</th></tr>
+{''.join(rows)}
+</table>
+</body></html>
+'''
+
+
+def load_report(output_path):
+    """The crawl report written next to a converted site, or None"""
+    try:
+        with open(os.path.join(output_path, REPORT_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def job_report_path(output_dir, job_id):
+    # Next to the job's ZIP, so it outlives the site directory (see retention.py)
+    return os.path.join(output_dir, f"crawl_report_{job_id}.json")
+
+
+def keep_report(output_dir, job_id, output_path):
+    """Copy a job's crawl report out of its site directory and return the report summary, or None"""
+    report = load_report(output_path)
+    if report is None:
+        return None
+    shutil.copyfile(os.path.join(output_path, REPORT_FILE), job_report_path(output_dir, job_id))
+    return report['summary']
+
+
+def load_job_report(output_dir, job_id):
+    """The crawl report kept for a job, or None"""
+    try:
+        with open(job_report_path(output_dir, job_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,89 @@
+"""
+Progress event bus for conversion jobs
+Each job keeps a bounded ring buffer of numbered events, so any number of
+subscribers can follow a job and resume from the last event they received.
+"""
+
+import threading
+import time
+from collections import deque
+
+# Events kept per job for late or reconnecting subscribers
+BUFFER_SIZE = 1000
+
+
+class EventBus:
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._cond = threading.Condition()
+        self._jobs = {}
+
+    def open(self, job_id):
+        """Create the event buffer of a job"""
+        with self._cond:
+            self._jobs[job_id] = {
+                'events': deque(maxlen=self.buffer_size),
+                'next_id': 1,
+                'closed': False
+            }
+
+    def exists(self, job_id):
+        with self._cond:
+            return job_id in self._jobs
+
+    def publish(self, job_id, data, event='message'):
+        """Append an event to a job and wake up its subscribers"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job['closed']:
+                return None
+            entry = {
+                'id': job['next_id'],
+                'event': event,
+                'data': data,
+                'time': time.time()
+            }
+            job['next_id'] += 1
+            job['events'].append(entry)
+            self._cond.notify_all()
+            return entry['id']
+
+    def close(self, job_id, data='end'):
+        """Publish the final event of a job, subscribers stop after it"""
+        with self._cond:
+            self.publish(job_id, data, event='end')
+            if job_id in self._jobs:
+                self._jobs[job_id]['closed'] = True
+            self._cond.notify_all()
+
+    def discard(self, job_id):
+        with self._cond:
+            self._jobs.pop(job_id, None)
+            self._cond.notify_all()
+
+    def _after(self, job_id, last_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return [], True
+        return [e for e in job['events'] if e['id'] > last_id], job['closed']
+
+    def events_after(self, job_id, last_id=0):
+        """Return (events newer than last_id, closed) without waiting"""
+        with self._cond:
+            return self._after(job_id, last_id)
+
+    def wait(self, job_id, last_id=0, timeout=None):
+        """
+        Return (events newer than last_id, closed), waiting up to timeout
+        seconds for a new event if there is none yet
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                events, closed = self._after(job_id, last_id)
+                if events or closed:
+                    return events, closed
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return [], False
+                self._cond.wait(remaining)
@@ -0,0 +1,73 @@
+# Page fixers - browser transforms for Wix widgets that don't work offline
+# Each fixer registers the selectors that trigger it and a rough cost. The pipeline
+# detects every trigger in one probe of the page and runs only the fixers that apply,
+# in registration order or, per site, cheapest first (cheapFirstFixers). Sites can turn
+# fixers off by name (disabledFixers).
+#
+# Adding a widget is a matter of registering its fix:
+#
+#     @register_fixer('videobox', ['wix-video'], cost=2)
+#     async def fix_videobox(page, **context):
+#         ...
+#
+# context holds the job data a fixer may need (mapData).
+
+FIXERS = {}
+
+# Selectors of the fixers that match the page
+PROBE_JS = '''(fixers) => Object.keys(fixers).filter(
+    name => fixers[name].some(selector => document.querySelector(selector) !== null))'''
+
+
+class Fixer:
+    def __init__(self, name, selectors, fix, cost=1, static_selectors=None):
+        self.name = name
+        self.selectors = list(selectors)
+        self.fix = fix
+        self.cost = cost
+        # Markup of the widget in the server-side rendered HTML, for staticrender.py
+        self.static_selectors = list(static_selectors) if static_selectors is not None else self.selectors
+
+
+def register_fixer(name, selectors, cost=1, static_selectors=None):
+    """Decorator registering fix(page, **context) for pages matching any of selectors"""
+    def decorator(fix):
+        FIXERS[name] = Fixer(name, selectors, fix, cost, static_selectors)
+        return fix
+    return decorator
+
+
+def parse_fixer_names(value):
+    # A list, or a comma separated string from config files and forms
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip() for name in value if name.strip()]
+
+
+def enabled_fixers(disabled=()):
+    disabled = set(parse_fixer_names(disabled))
+    return {name: fixer for name, fixer in FIXERS.items() if name not in disabled}
+
+
+async def detect_fixers(page, disabled=()):
+    """Names of the enabled fixers whose selectors are on the page, in one evaluate"""
+    fixers = enabled_fixers(disabled)
+    if not fixers:
+        return []
+    return await page.evaluate(PROBE_JS, {name: fixer.selectors for name, fixer in fixers.items()})
+
+
+async def run_fixers(page, names, cheap_first=False, **context):
+    """Run the named fixers in registration order, or cheapest first with cheap_first"""
+    fixers = [fixer for name, fixer in FIXERS.items() if name in names]
+    if cheap_first:
+        fixers.sort(key=lambda fixer: fixer.cost)
+    for fixer in fixers:
+        await fixer.fix(page, **context)
+
+
+def static_selectors(disabled=()):
+    """Selectors of server-side rendered markup that needs a browser fixer"""
+    return [selector for fixer in enabled_fixers(disabled).values() for selector in fixer.static_selectors]
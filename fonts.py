@@ -0,0 +1,287 @@
+# Font pipeline - parses @font-face rules, downloads the fonts concurrently,
+# recompresses them to woff2 and optionally subsets them to the glyphs used on the site.
+
+import io
+import os
+import re
+import string
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from assetcache import fetch_asset
+
+# fontTools (and brotli for woff2) are optional, without them fonts keep their original format
+try:
+    from fontTools.ttLib import TTFont
+    from fontTools import subset as ftsubset
+except ImportError:
+    TTFont = None
+    ftsubset = None
+
+FONT_FACE_RE = re.compile(r'@font-face\s*{([^}]*)}', re.IGNORECASE)
+SRC_RE = re.compile(r'(?<![-\w])src\s*:\s*((?:url\([^)]*\)|[^;}])*);?', re.IGNORECASE)
+URL_RE = re.compile(r'url\(\s*([\'"]?)(.*?)\1\s*\)', re.IGNORECASE)
+# Weights and styles selected by font declarations (font, font-weight, font-style, custom properties)
+WEIGHT_TOKEN_RE = re.compile(r'(?<![-\w.])(bold|bolder|lighter|[1-9]00)(?![-\w.])')
+ITALIC_TOKEN_RE = re.compile(r'(?<![-\w])(italic|oblique)(?![-\w])')
+
+# Preferred source formats, best first. SVG fonts are never picked.
+FONT_FORMATS = {
+    '.woff2': 'woff2',
+    '.woff': 'woff',
+    '.ttf': 'truetype',
+    '.otf': 'opentype',
+    '.eot': 'embedded-opentype',
+}
+CONVERTIBLE = ('.woff', '.ttf', '.otf', '.eot')
+
+# Glyphs always kept when subsetting
+BASE_GLYPHS = string.printable + ' –—‘’“”•…'
+
+def font_extension(url):
+    # Real extension of the url path, so "svg" in a query string is not a font
+    return os.path.splitext(urlparse(url).path)[1].lower()
+
+def descriptor(body, name, default=''):
+    match = re.search(r'(?<![-\w])' + name + r'\s*:\s*([^;]+)', body, re.IGNORECASE)
+    return match.group(1).strip() if match else default
+
+def normalize_family(family):
+    return family.strip().strip('\'"').strip().lower()
+
+def normalize_weight(weight):
+    weight = (weight or 'normal').strip().lower()
+    return {'normal': '400', 'bold': '700'}.get(weight, weight)
+
+def normalize_style(style):
+    style = (style or 'normal').strip().lower()
+    return 'italic' if style.startswith('oblique') else style
+
+def parse_font_faces(css):
+    """
+    Find the @font-face rules of a stylesheet.
+    Returns a list of dicts with the rule span, descriptors and source urls.
+    """
+    faces = []
+    for match in FONT_FACE_RE.finditer(css):
+        body = match.group(1)
+        sources = []
+        for src in SRC_RE.finditer(body):
+            sources += [url for _, url in URL_RE.findall(src.group(1))]
+        faces.append({
+            'span': match.span(),
+            'body': body,
+            'family': normalize_family(descriptor(body, 'font-family')),
+            'weight': normalize_weight(descriptor(body, 'font-weight')),
+            'style': normalize_style(descriptor(body, 'font-style')),
+            'sources': sources,
+        })
+    return faces
+
+def pick_source(sources):
+    # Best remote source of a face, or None if it has nothing to localize
+    candidates = []
+    for url in sources:
+        if url.startswith('data:'):
+            return None
+        ext = font_extension(url)
+        if ext in FONT_FORMATS and (url.startswith('http') or url.startswith('//')):
+            candidates.append((list(FONT_FORMATS).index(ext), url))
+    if not candidates:
+        return None
+    url = min(candidates)[1]
+    return 'https:' + url if url.startswith('//') else url
+
+def eot_to_sfnt(data):
+    # Unwrap an uncompressed EOT into the TrueType font it embeds
+    eot_size, font_data_size, version, flags = struct.unpack('<IIII', data[:16])
+    if flags & 0x4:
+        raise ValueError('MicroType Express compressed EOT is not supported')
+    font = data[eot_size - font_data_size:eot_size]
+    if flags & 0x10000000:
+        font = bytes(b ^ 0x50 for b in font)
+    return font
+
+def to_woff2(data, ext):
+    if ext == '.eot':
+        data = eot_to_sfnt(data)
+    font = TTFont(io.BytesIO(data))
+    font.flavor = 'woff2'
+    out = io.BytesIO()
+    font.save(out)
+    return out.getvalue()
+
+class FontPipeline:
+    """
+    Localizes the fonts of one job. Each font url is downloaded once, however many
+    pages or stylesheets reference it. Call finalize() after the last page to subset.
+    """
+
+    def __init__(self, fonts_dir, forceDownloadAgain=False, woff2=True, subset=False, max_workers=8, assetCache=None,
+                 budget=None):
+        self.fonts_dir = fonts_dir
+        self.forceDownloadAgain = forceDownloadAgain
+        self.assetCache = assetCache
+        self.budget = budget
+        self.woff2 = woff2 and TTFont is not None
+        self.subset = subset and ftsubset is not None
+        self.max_workers = max_workers
+        self.files = {}     # font url -> local file name
+        self.sources = {}   # local file name -> font bytes downloaded by this job, for subsetting
+        self.glyphs = set(BASE_GLYPHS)
+
+        if not os.path.exists(fonts_dir):
+            os.makedirs(fonts_dir)
+
+    def add_text(self, text):
+        # Record text rendered on a page, for subsetting
+        if self.subset and text:
+            self.glyphs.update(text)
+
+    def target_name(self, url):
+        name = urlparse(url).path.split('/')[-1]
+        ext = font_extension(url)
+        if self.woff2 and ext in CONVERTIBLE:
+            return name[:-len(ext)] + '.woff2'
+        return name
+
+    def download(self, url):
+        # Runs on the worker pool, returns (local name, bytes or None if already on disk)
+        name = self.target_name(url)
+        if not self.forceDownloadAgain and os.path.exists(os.path.join(self.fonts_dir, name)):
+            return name, None
+
+        data = fetch_asset(url, self.assetCache, budget=self.budget)
+
+        ext = font_extension(url)
+        if name.endswith('.woff2') and ext != '.woff2':
+            try:
+                data = to_woff2(data, ext)
+            except Exception as e:
+                print(f"Could not convert font {url} to woff2: {e}")
+                name = urlparse(url).path.split('/')[-1]
+
+        with open(os.path.join(self.fonts_dir, name), 'wb') as f:
+            f.write(data)
+        return name, data
+
+    def download_all(self, urls):
+        urls = [url for url in dict.fromkeys(urls) if url not in self.files]
+        if not urls:
+            return
+
+        def fetch(url):
+            try:
+                return url, self.download(url)
+            except Exception as e:
+                print(f"Error downloading font {url}: {e}")
+                return url, None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for url, result in executor.map(fetch, urls):
+                if result is None:
+                    continue
+                name, data = result
+                self.files[url] = name
+                # Keep the bytes only when finalize will subset them
+                if data is not None and self.subset:
+                    self.sources[name] = data
+
+    def process_styles(self, styles, used=None, referenced_text=None, declarations=None):
+        """
+        Localize the fonts of a page's stylesheets and return the rewritten css texts.
+
+        declarations are the font related values (font, font-*, custom properties) of every
+        CSS rule and style attribute of the page; a face is dropped when no declaration names
+        its family with its weight and style. Faces in used, the [family, weight, style] faces
+        the browser loaded, are always kept. Without a browser, pass referenced_text (the
+        page markup) instead and faces whose family never appears in it are dropped.
+        """
+        used_faces = set()
+        used_families = set()
+        for family, weight, style in used or []:
+            family = normalize_family(family)
+            used_families.add(family)
+            used_faces.add((family, normalize_weight(weight), normalize_style(style)))
+
+        if referenced_text is not None:
+            # Font families are referenced outside of @font-face rules only
+            referenced_text = FONT_FACE_RE.sub('', referenced_text).lower()
+
+        if declarations is not None:
+            declared_text = '\n'.join(declarations).lower()
+            declared_weights = {normalize_weight(weight) for weight in WEIGHT_TOKEN_RE.findall(declared_text)}
+            declared_italic = ITALIC_TOKEN_RE.search(declared_text) is not None
+
+        def is_declared(face):
+            if face['family'] not in declared_text:
+                return False
+            # Relative weights may select any face of the family
+            if ' ' not in face['weight'] and face['weight'] != '400' \
+                    and face['weight'] not in declared_weights and not {'bolder', 'lighter'} & declared_weights:
+                return False
+            return face['style'] == 'normal' or declared_italic
+
+        def is_used(face):
+            if (face['family'], face['weight'], face['style']) in used_faces:
+                return True
+            if ' ' in face['weight'] and face['family'] in used_families:
+                # Variable font weight range
+                return True
+            if not face['family']:
+                return True
+            if declarations is not None:
+                return is_declared(face)
+            if used_faces:
+                return False
+            if referenced_text is not None:
+                return face['family'] in referenced_text
+            return True
+
+        parsed = [parse_font_faces(css) for css in styles]
+        dropped = {f"{face['family']} {face['weight']} {face['style']}"
+                   for faces in parsed for face in faces if not is_used(face)}
+        if dropped:
+            print("Dropping unused font faces: " + ', '.join(sorted(dropped)))
+        self.download_all([url for faces in parsed for face in faces if is_used(face)
+                           for url in [pick_source(face['sources'])] if url])
+
+        result = []
+        for css, faces in zip(styles, parsed):
+            # Rewrite from the end so earlier spans stay valid
+            for face in reversed(faces):
+                start, end = face['span']
+                if not is_used(face):
+                    css = css[:start] + css[end:]
+                    continue
+                url = pick_source(face['sources'])
+                if url not in self.files:
+                    continue
+                name = self.files[url]
+                body = SRC_RE.sub('', face['body']).strip().rstrip(';')
+                if 'font-display' not in body:
+                    body += '; font-display: swap'
+                fmt = FONT_FORMATS.get(os.path.splitext(name)[1].lower(), 'woff')
+                css = (css[:start] + '@font-face { ' + body + '; src: url("/fonts/' + name + '") format("' + fmt + '"); }'
+                       + css[end:])
+            result.append(css)
+        return result
+
+    def finalize(self):
+        # Subset the fonts downloaded by this job to the glyphs seen on its pages
+        if not self.subset:
+            return
+        text = ''.join(sorted(self.glyphs))
+        for name, data in self.sources.items():
+            try:
+                options = ftsubset.Options()
+                options.flavor = {'.woff2': 'woff2', '.woff': 'woff'}.get(os.path.splitext(name)[1].lower())
+                options.layout_features = ['*']
+                font = TTFont(io.BytesIO(data))
+                subsetter = ftsubset.Subsetter(options=options)
+                subsetter.populate(text=text)
+                subsetter.subset(font)
+                ftsubset.save_font(font, os.path.join(self.fonts_dir, name), options)
+            except Exception as e:
+                print(f"Could not subset font {name}: {e}")
@@ -176,7 +176,7 @@ pip install --upgrade pip
 pip install wheel setuptools
 
 echo "Installing Flask and dependencies..."
-pip install flask werkzeug requests pillow gunicorn
+pip install flask werkzeug requests pillow beautifulsoup4 'fonttools[woff]' gunicorn
 
 echo "Installing Playwright..."
 pip install playwright
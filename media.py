@@ -0,0 +1,263 @@
+# Media localization - videos, audio and CSS background images
+# Finds the media a page still loads from Wix servers (video/audio sources and posters,
+# url() references in style attributes and <style> elements), downloads it into media/
+# and rewrites the references in the same pass. Large files are streamed to disk with
+# resumable ranged requests. With ffmpeg installed, videos without a poster get one
+# from their first second, and MEDIA_TRANSCODE=true re-encodes them to H.264 MP4.
+
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+from ratelimit import limited_get
+
+MEDIA_EXTENSIONS = ('.mp4', '.webm', '.mov', '.m4v', '.ogv', '.mp3', '.m4a', '.ogg', '.wav',
+                    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.svg')
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov', '.m4v', '.ogv')
+
+CSS_URL_RE = re.compile(r'''url\((['"]?)(.*?)\1\)''')
+
+# Bytes written per read of a streamed download
+CHUNK_BYTES = 1024 * 1024
+# Attempts of a download, each one resuming where the last stopped
+DOWNLOAD_ATTEMPTS = 3
+
+FFMPEG = shutil.which('ffmpeg')
+TRANSCODE = os.environ.get('MEDIA_TRANSCODE', 'false').lower() == 'true'
+
+# Media referenced by the page. Video and audio sources are taken whatever their
+# extension, CSS urls only when they look like media (font urls are left to fonts.py)
+COLLECT_JS = r'''(extensions) => {
+    const urls = new Set();
+    const remote = url => /^https?:/.test(url || '');
+    const isMedia = url => remote(url) && extensions.some(ext => url.split(/[?#]/)[0].toLowerCase().endsWith(ext));
+    const fromCss = text => {
+        for (const match of (text || '').matchAll(/url\((['"]?)(.*?)\1\)/g)) {
+            if (isMedia(match[2])) urls.add(match[2]);
+        }
+    };
+    for (const element of document.querySelectorAll('video, audio, source')) {
+        if (remote(element.src)) urls.add(element.src);
+        if (remote(element.poster)) urls.add(element.poster);
+    }
+    for (const element of document.querySelectorAll('[style*="url("]')) fromCss(element.getAttribute('style'));
+    for (const element of document.querySelectorAll('style')) fromCss(element.textContent);
+    return Array.from(urls);
+}'''
+
+REWRITE_JS = r'''([mapping, posters]) => {
+    for (const element of document.querySelectorAll('video, audio, source')) {
+        const src = element.src;
+        if (mapping[src]) element.setAttribute('src', mapping[src]);
+        if (element.poster && mapping[element.poster]) element.setAttribute('poster', mapping[element.poster]);
+        const video = element.tagName === 'SOURCE' ? element.closest('video') : element;
+        if (posters[src] && video && video.tagName === 'VIDEO' && !video.getAttribute('poster')) {
+            video.setAttribute('poster', posters[src]);
+        }
+    }
+    const rewrite = text => text.replace(/url\((['"]?)(.*?)\1\)/g,
+        (match, quote, url) => mapping[url] ? 'url(' + quote + mapping[url] + quote + ')' : match);
+    for (const element of document.querySelectorAll('[style*="url("]')) {
+        element.setAttribute('style', rewrite(element.getAttribute('style')));
+    }
+    for (const element of document.querySelectorAll('style')) {
+        const text = element.textContent;
+        const next = rewrite(text);
+        if (next !== text) element.textContent = next;
+    }
+}'''
+
+
+def is_media_url(url):
+    return url.startswith(('http://', 'https://')) and \
+        url.split('?')[0].split('#')[0].lower().endswith(MEDIA_EXTENSIONS)
+
+
+def css_media_urls(css):
+    return [match.group(2) for match in CSS_URL_RE.finditer(css or '') if is_media_url(match.group(2))]
+
+
+def rewrite_css(css, mapping):
+    def replace(match):
+        quote, url = match.groups()
+        return f'url({quote}{mapping[url]}{quote})' if url in mapping else match.group(0)
+    return CSS_URL_RE.sub(replace, css)
+
+
+def stream_download(url, path, budget=None):
+    """Download url to path in chunks, resuming from a partial file when a transfer breaks"""
+    part = path + '.part'
+    try:
+        for attempt in range(DOWNLOAD_ATTEMPTS):
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            headers = {'Range': f'bytes={offset}-'} if offset else {}
+            try:
+                with limited_get(url, headers=headers, stream=True, allow_redirects=True, timeout=60) as r:
+                    # Range beyond the end: the partial file is already complete
+                    if r.status_code == 416 and offset:
+                        break
+                    r.raise_for_status()
+                    # Servers that ignore Range send the whole file again
+                    mode = 'ab' if r.status_code == 206 else 'wb'
+                    with open(part, mode) as f:
+                        for chunk in r.iter_content(CHUNK_BYTES):
+                            f.write(chunk)
+                            if budget is not None:
+                                budget.add_bytes(len(chunk))
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt == DOWNLOAD_ATTEMPTS - 1:
+                    raise
+                print(f"Download of {url} interrupted ({e}), resuming")
+        os.replace(part, path)
+    except BaseException:
+        # A failed download must not end up in the ZIP
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+
+
+def run_ffmpeg(*args):
+    result = subprocess.run([FFMPEG, '-y', '-loglevel', 'error', *args], capture_output=True, timeout=600)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf-8', 'replace').strip())
+
+
+class MediaLocalizer:
+    """
+    Localizes the media of one job. Each url is downloaded once however many pages use it.
+    """
+
+    def __init__(self, media_dir, forceDownloadAgain=False, posters=True, transcode=TRANSCODE, max_workers=4,
+                 budget=None):
+        self.media_dir = media_dir
+        self.forceDownloadAgain = forceDownloadAgain
+        self.posters = posters and FFMPEG is not None
+        self.transcode = transcode and FFMPEG is not None
+        self.max_workers = max_workers
+        self.budget = budget
+        self.files = {}       # media url -> local file name
+        self.poster_files = {}  # video url -> generated poster file name
+
+        if not os.path.exists(media_dir):
+            os.makedirs(media_dir)
+
+    def local_name(self, url):
+        # Wix media urls often end in the same file name (e.g. .../1080p/mp4/file.mp4)
+        path = urlparse(url).path
+        name = os.path.basename(path) or 'media'
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()[:10] + '-' + name
+
+    def download(self, url):
+        name = self.local_name(url)
+        path = os.path.join(self.media_dir, name)
+        video = os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS
+
+        if self.transcode and video:
+            transcoded = os.path.splitext(name)[0] + '.h264.mp4'
+            if not self.forceDownloadAgain and os.path.exists(os.path.join(self.media_dir, transcoded)):
+                return transcoded
+        if self.forceDownloadAgain or not os.path.exists(path):
+            stream_download(url, path, self.budget)
+
+        if self.transcode and video:
+            try:
+                run_ffmpeg('-i', path, '-c:v', 'libx264', '-crf', '28', '-preset', 'veryfast',
+                           '-c:a', 'aac', '-movflags', '+faststart', os.path.join(self.media_dir, transcoded))
+                os.remove(path)
+                return transcoded
+            except Exception as e:
+                print(f"Could not transcode {url}: {e}")
+        return name
+
+    def make_poster(self, url, name):
+        poster = os.path.splitext(name)[0] + '.poster.jpg'
+        path = os.path.join(self.media_dir, poster)
+        if self.forceDownloadAgain or not os.path.exists(path):
+            run_ffmpeg('-ss', '1', '-i', os.path.join(self.media_dir, name), '-frames:v', '1', '-q:v', '3', path)
+        return poster
+
+    def fetch(self, url):
+        # Runs on the worker pool
+        try:
+            name = self.download(url)
+        except Exception as e:
+            print(f"Error downloading media {url}: {e}")
+            return url, None, None
+        poster = None
+        if self.posters and os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS:
+            try:
+                poster = self.make_poster(url, name)
+            except Exception as e:
+                print(f"Could not make a poster for {url}: {e}")
+        return url, name, poster
+
+    def fetch_missing(self, urls):
+        missing = [url for url in dict.fromkeys(urls) if url not in self.files]
+        if not missing:
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for url, name, poster in executor.map(self.fetch, missing):
+                if name is not None:
+                    self.files[url] = name
+                if poster is not None:
+                    self.poster_files[url] = poster
+
+    def mappings(self, urls):
+        mapping = {url: '/media/' + self.files[url] for url in urls if url in self.files}
+        posters = {url: '/media/' + self.poster_files[url] for url in urls if url in self.poster_files}
+        return mapping, posters
+
+    async def localize(self, page):
+        """Download the page's media and point its references at the local copies. Returns the media count."""
+        urls = await page.evaluate(COLLECT_JS, list(MEDIA_EXTENSIONS))
+        if not urls:
+            return 0
+        await asyncio.to_thread(self.fetch_missing, urls)
+        mapping, posters = self.mappings(urls)
+        if mapping:
+            await page.evaluate(REWRITE_JS, [mapping, posters])
+        return len(mapping)
+
+    def localize_soup(self, soup, url):
+        """localize() for a BeautifulSoup document of the static render path"""
+        sources = soup.find_all(['video', 'audio', 'source'])
+        for element in sources:
+            for attribute in ('src', 'poster'):
+                if element.get(attribute):
+                    element[attribute] = urljoin(url, element[attribute])
+        urls = [element[attribute] for element in sources for attribute in ('src', 'poster')
+                if element.get(attribute, '').startswith(('http://', 'https://'))]
+        styled = soup.find_all(style=lambda value: value and 'url(' in value)
+        styles = soup.find_all('style')
+        for element in styled:
+            urls += css_media_urls(element['style'])
+        for element in styles:
+            urls += css_media_urls(element.string)
+        if not urls:
+            return 0
+
+        self.fetch_missing(urls)
+        mapping, posters = self.mappings(urls)
+        for element in sources:
+            src = element.get('src')
+            if src in mapping:
+                element['src'] = mapping[src]
+            if element.get('poster') in mapping:
+                element['poster'] = mapping[element['poster']]
+            video = element if element.name != 'source' else element.find_parent('video')
+            if src in posters and video is not None and video.name == 'video' and not video.get('poster'):
+                video['poster'] = posters[src]
+        for element in styled:
+            element['style'] = rewrite_css(element['style'], mapping)
+        for element in styles:
+            if element.string:
+                element.string = rewrite_css(element.string, mapping)
+        return len(mapping)
@@ -0,0 +1,167 @@
+# Output optimizer - minifies the converted pages and precompresses text assets
+# Every text file gets .gz (and .br when brotli is installed) siblings, so a web server
+# can send them as is (nginx gzip_static / brotli_static) instead of compressing each
+# response on the fly. Files are processed in parallel on a process pool shared by all
+# jobs of the process.
+
+import gzip
+import html as htmllib
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MINIFIED_EXTENSIONS = ('.html', '.css')
+COMPRESSED_EXTENSIONS = ('.html', '.css', '.js', '.svg', '.json', '.xml', '.txt', '.ttf', '.otf', '.eot')
+# Smaller files don't gain from compression
+MIN_COMPRESS_BYTES = 256
+
+# Size of the shared pool, whatever the number of jobs optimizing at once
+MAX_WORKERS = int(os.environ.get('OPTIMIZE_WORKERS', min(4, os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Quoted strings are kept as they are, comments are dropped
+CSS_SKIP_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/''', re.S)
+CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*|(:)\s+')
+
+# Elements whose content must not be touched by the whitespace collapsing
+RAW_BLOCK_RE = re.compile(r'(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)', re.S | re.I)
+COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.S)
+WHITESPACE_RE = re.compile(r'\s+')
+# Start tags, attribute values may contain '>'
+TAG_RE = re.compile(r'''<[a-zA-Z][^\s/>]*(?:[^>"']|"[^"]*"|'[^']*')*>''')
+EMPTY_DATA_ATTRIBUTE_RE = re.compile(r'\sdata-[\w:.-]+=""(?=[\s/>])')
+STYLE_ATTRIBUTE_RE = re.compile(r'''(\sstyle=)(?:"([^"]*)"|'([^']*)')''', re.I)
+
+
+def minify_css(css):
+    def squeeze(text):
+        # Whitespace before a colon can be a descendant combinator (a :hover), after it never matters
+        text = CSS_PUNCTUATION_RE.sub(lambda match: match.group(1) or match.group(2), WHITESPACE_RE.sub(' ', text))
+        return text.replace(';}', '}')
+
+    parts = []
+    last = 0
+    for match in CSS_SKIP_RE.finditer(css):
+        parts.append(squeeze(css[last:match.start()]))
+        if match.group(1):
+            parts.append(match.group(1))
+        else:
+            parts.append(' ')
+        last = match.end()
+    parts.append(squeeze(css[last:]))
+    return ''.join(parts).strip()
+
+
+def minify_style_attribute(match):
+    # The css is minified unescaped (&quot; holds a ';') and escaped again for its quotes
+    quote = '"' if match.group(2) is not None else "'"
+    value = match.group(2) if match.group(2) is not None else match.group(3)
+    css = minify_css(htmllib.unescape(value)).rstrip(';')
+    css = css.replace('&', '&amp;').replace(quote, '&quot;' if quote == '"' else '&#39;')
+    return match.group(1) + quote + css + quote
+
+
+def minify_tag(match):
+    tag = EMPTY_DATA_ATTRIBUTE_RE.sub('', match.group(0))
+    return STYLE_ATTRIBUTE_RE.sub(minify_style_attribute, tag)
+
+
+def minify_markup(html):
+    # Outside of raw blocks: collapse whitespace, drop comments and, inside tags, empty data-* attributes
+    html = COMMENT_RE.sub('', html)
+    html = WHITESPACE_RE.sub(lambda match: '\n' if '\n' in match.group(0) else ' ', html)
+    return TAG_RE.sub(minify_tag, html)
+
+
+def minify_html(html):
+    parts = []
+    last = 0
+    for match in RAW_BLOCK_RE.finditer(html):
+        parts.append(minify_markup(html[last:match.start()]))
+        open_tag, name, content, close_tag = match.groups()
+        if name.lower() == 'style':
+            content = minify_css(content)
+        parts.append(minify_markup(open_tag) + content + close_tag)
+        last = match.end()
+    parts.append(minify_markup(html[last:]))
+    return ''.join(parts)
+
+
+def write_compressed(path, data):
+    # A compressed sibling is only kept when it is smaller
+    variants = [('.gz', lambda: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda: brotli.compress(data, quality=11)))
+    for suffix, compress in variants:
+        compressed = compress()
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def optimize_file(path, minify=True):
+    """Minify and precompress one file, returns (bytes before, bytes after minifying)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    before = len(data)
+    ext = os.path.splitext(path)[1].lower()
+
+    if minify and ext in MINIFIED_EXTENSIONS:
+        try:
+            text = data.decode('utf-8')
+            text = minify_html(text) if ext == '.html' else minify_css(text)
+            data = text.encode('utf-8')
+            with open(path, 'wb') as f:
+                f.write(data)
+        except (UnicodeDecodeError, RecursionError) as e:
+            print(f"Could not minify {path}: {e}")
+
+    if ext in COMPRESSED_EXTENSIONS and len(data) >= MIN_COMPRESS_BYTES:
+        write_compressed(path, data)
+    return before, len(data)
+
+
+def get_pool():
+    """
+    The shared process pool. Workers start from a fork server (or are spawned), never
+    forked from this process, which runs Flask, retention and Playwright threads.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def optimize_site(output_path, minify=True):
+    """
+    Optimize all files of a converted site in parallel.
+    Returns {'files', 'bytes_before', 'bytes_after'}.
+    """
+    paths = []
+    for root, dirs, files in os.walk(output_path):
+        for file in files:
+            ext = os.path.splitext(file)[1].lower()
+            if ext in COMPRESSED_EXTENSIONS or ext in MINIFIED_EXTENSIONS:
+                paths.append(os.path.join(root, file))
+
+    summary = {'files': len(paths), 'bytes_before': 0, 'bytes_after': 0}
+    if not paths:
+        return summary
+
+    for before, after in get_pool().map(optimize_file, paths, [minify] * len(paths), chunksize=8):
+        summary['bytes_before'] += before
+        summary['bytes_after'] += after
+    return summary
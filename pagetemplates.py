@@ -0,0 +1,98 @@
+# Template fingerprinting - recognizes pages rendered from the same Wix template
+# Blog posts, products and other dynamic pages share one skeleton of components and only
+# differ in their data. The first page of a template records whether scrolling loaded more
+# content, and following pages skip the scroll when it didn't and they have no images still
+# waiting to load. Widget probes still run on every page, since the data of a post can hold
+# a widget its template doesn't have. Style rewrites are memoized by content hash, so stylesheets shared between
+# pages are only transferred and processed once.
+
+import asyncio
+import hashlib
+
+# Wix component ids are the same on every page of a template; repeater items get
+# an "__item" suffix, which is dropped so the number of items doesn't matter
+FINGERPRINT_JS = '''() => {
+    const ids = new Set();
+    for (const element of document.querySelectorAll('[id^="comp-"]')) {
+        ids.add(element.id.split('__')[0]);
+    }
+    return Array.from(ids).sort().join('|');
+}'''
+
+# Changes when scrolling lazy-loads images or content. Wix swaps blurred placeholders
+# (blur_ in the url) for the sharp images, which changes neither the count nor currentSrc
+CONTENT_STATE_JS = '''() => [document.body.scrollHeight, document.images.length,
+    Array.from(document.images).filter(image => image.currentSrc).length,
+    document.querySelectorAll('img[src*="blur_"]').length]'''
+
+# Images of the page that scrolling would still load or sharpen
+PENDING_IMAGES_JS = '''() => Array.from(document.images).filter(
+    image => image.src.includes('blur_') || !image.complete || !image.currentSrc).length'''
+
+STYLE_HASHES_JS = '''nodes => nodes.map(node => {
+    const text = node.textContent;
+    let a = 0x811c9dc5, b = 0x01000193;
+    for (let i = 0; i < text.length; i++) {
+        const c = text.charCodeAt(i);
+        a = Math.imul(a ^ c, 16777619);
+        b = Math.imul(b + c, 2654435761);
+    }
+    return (a >>> 0).toString(16) + (b >>> 0).toString(16) + ':' + text.length;
+})'''
+
+# Memoized style rewrites kept per job
+MAX_STYLES = 5000
+
+
+class TemplatePlan:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.scroll = None  # whether scrolling loaded more content on the first page
+        self.pages = 0
+
+
+class TemplateCache:
+    """Template plans and style rewrites of one scrape job"""
+
+    def __init__(self):
+        self.plans = {}
+        self.styles = {}  # (style hash, key) -> rewritten text, None if unchanged
+
+    async def plan(self, page):
+        """Return the plan of the page's template, or None for pages without Wix components"""
+        skeleton = await page.evaluate(FINGERPRINT_JS)
+        if not skeleton:
+            return None
+        fingerprint = hashlib.sha1(skeleton.encode('utf-8')).hexdigest()[:12]
+        if fingerprint not in self.plans:
+            self.plans[fingerprint] = TemplatePlan(fingerprint)
+        plan = self.plans[fingerprint]
+        plan.pages += 1
+        if plan.pages > 1:
+            print(f"Template {fingerprint} already seen on {plan.pages - 1} page(s), reusing its plan")
+        return plan
+
+    async def rewrite_styles(self, page, rewrite, key=''):
+        """
+        Apply rewrite (list of css texts -> list of css texts) to the page's <style> elements.
+        Only styles not seen before with the same key are read from the page and rewritten.
+        rewrite runs on a thread, it may download.
+        """
+        hashes = await page.eval_on_selector_all('style', STYLE_HASHES_JS)
+        if len(self.styles) > MAX_STYLES:
+            self.styles.clear()
+        missing = [i for i, h in enumerate(hashes) if (h, key) not in self.styles]
+        if missing:
+            texts = await page.eval_on_selector_all(
+                'style', '(nodes, indexes) => indexes.map(i => nodes[i].textContent)', missing)
+            for i, text, new in zip(missing, texts, await asyncio.to_thread(rewrite, texts)):
+                self.styles[(hashes[i], key)] = new if new != text else None
+
+        changes = {}
+        for i, h in enumerate(hashes):
+            new = self.styles[(h, key)]
+            if new is not None:
+                changes[str(i)] = new
+        if changes:
+            await page.eval_on_selector_all(
+                'style', '(nodes, changes) => { for (const i in changes) nodes[i].textContent = changes[i]; }', changes)
@@ -0,0 +1,155 @@
+# Rate limiting - per-host token buckets shared by all network activity of the process
+# Every host starts at HOST_RATE requests per second. A 429 or 503 halves the host's rate
+# and pauses it (for Retry-After when the server sends one), each successful response
+# raises the rate again by RECOVERY_STEP, so throughput settles just below what the host
+# tolerates. Workers on other machines have their own limiter.
+
+import asyncio
+import email.utils
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+DEFAULT_RATE = float(os.environ.get('HOST_RATE', 10))
+MIN_RATE = 0.5
+MAX_RATE = 50.0
+# Requests a host may receive at once after being idle
+BURST = 20
+# Requests per second regained with every successful response
+RECOVERY_STEP = 0.1
+
+THROTTLE_STATUSES = (429, 503)
+# Pause when a throttled response has no Retry-After, doubled on repeated throttling
+DEFAULT_BACKOFF = 2
+MAX_BACKOFF = 120
+# Attempts of a throttled request before giving up
+MAX_RETRIES = 4
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delay or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class HostBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.strikes = 0
+
+
+class RateLimiter:
+    """
+    Token bucket per host name. reserve() takes a token and returns how long the
+    caller must wait before sending; a bucket can go negative, which queues callers
+    behind each other instead of letting them all retry at once.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=BURST, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def bucket(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = HostBucket(self.rate, self.burst)
+        return self._hosts[host]
+
+    def reserve(self, url):
+        host = urlparse(url).hostname
+        if not host:
+            return 0
+        with self._lock:
+            bucket = self.bucket(host)
+            now = time.monotonic()
+            bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            bucket.tokens -= 1
+            return -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0
+
+    def wait(self, url):
+        delay = self.reserve(url)
+        if delay:
+            time.sleep(delay)
+
+    async def wait_async(self, url):
+        delay = self.reserve(url)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def feedback(self, url, status, retry_after=None):
+        """Adapt the host's rate to the status of a response"""
+        host = urlparse(url).hostname
+        if not host:
+            return
+        with self._lock:
+            bucket = self.bucket(host)
+            if status in THROTTLE_STATUSES:
+                pause = parse_retry_after(retry_after)
+                if pause is None:
+                    pause = min(DEFAULT_BACKOFF * 2 ** bucket.strikes, MAX_BACKOFF)
+                bucket.strikes += 1
+                bucket.rate = max(bucket.rate / 2, self.min_rate)
+                # Nothing is sent to the host until the pause has been refilled
+                bucket.tokens = min(bucket.tokens, 0) - min(pause, MAX_BACKOFF) * bucket.rate
+                print(f"Throttled by {host} ({status}), slowing down to {bucket.rate:.1f} requests/s")
+            elif status < 400:
+                bucket.strikes = 0
+                bucket.rate = min(bucket.rate + RECOVERY_STEP, self.max_rate)
+
+
+# Process wide limiter, shared by all jobs
+limiter = RateLimiter()
+
+
+def limited_get(url, **kwargs):
+    """requests.get through the limiter, retrying throttled responses"""
+    for attempt in range(MAX_RETRIES):
+        limiter.wait(url)
+        r = requests.get(url, **kwargs)
+        limiter.feedback(url, r.status_code, r.headers.get('retry-after'))
+        if r.status_code not in THROTTLE_STATUSES or attempt == MAX_RETRIES - 1:
+            break
+        # Release the connection of a streamed response before retrying
+        r.close()
+    return r
+
+
+async def limited_goto(page, url, **kwargs):
+    """page.goto through the limiter, retrying throttled navigations"""
+    for attempt in range(MAX_RETRIES):
+        await limiter.wait_async(url)
+        response = await page.goto(url, **kwargs)
+        # The context's response listener (throttle_responses) has already reported the status
+        if response is None or response.status not in THROTTLE_STATUSES:
+            break
+    return response
+
+
+def throttle_responses(context, skip_types=()):
+    """
+    Feed the statuses of the responses a browser context receives to the limiter.
+    Requests of skip_types are answered by a route that already reports them.
+    """
+    def on_response(response):
+        if response.request.resource_type not in skip_types:
+            limiter.feedback(response.url, response.status, response.headers.get('retry-after'))
+
+    context.on('response', on_response)
@@ -0,0 +1,214 @@
+"""
+Output retention for converted sites
+Expires job output after a TTL and evicts the least recently downloaded jobs
+when OUTPUT_DIR grows past its quota, so converted_sites/ cannot fill the disk.
+"""
+
+import os
+import shutil
+import threading
+import time
+
+# Statuses whose output must never be deleted
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def path_size(path):
+    """Size in bytes of a file or directory tree"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+
+def parse_ttl_hours(value, default):
+    """A job's retentionHours option as a positive number of hours, default when missing or invalid"""
+    try:
+        hours = float(value)
+    except (TypeError, ValueError):
+        return default
+    return hours if hours > 0 else default
+
+
+def remove_path(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class RetentionManager:
+    def __init__(self, output_dir, jobs, ttl_hours=24, quota_mb=2048, drop_site_dir=False, on_evict=None,
+                 broker=None):
+        self.output_dir = output_dir
+        self.jobs = jobs
+        # Jobs unknown to this process (e.g. after a restart) may still be running on a worker
+        self.broker = broker
+        self.ttl_hours = ttl_hours
+        self.quota_bytes = int(quota_mb * 1024 * 1024)
+        self.drop_site_dir = drop_site_dir
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._last_access = {}
+        self._downloads = {}
+        self._wake = threading.Event()
+
+    def touch(self, job_id):
+        """Mark a job as just used (completed or downloaded)"""
+        with self._lock:
+            self._last_access[job_id] = time.time()
+
+    def download_started(self, job_id):
+        with self._lock:
+            self._downloads[job_id] = self._downloads.get(job_id, 0) + 1
+            self._last_access[job_id] = time.time()
+
+    def download_finished(self, job_id):
+        with self._lock:
+            self._downloads[job_id] = max(self._downloads.get(job_id, 1) - 1, 0)
+            self._last_access[job_id] = time.time()
+
+    def is_protected(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None and job.get('status') in ACTIVE_STATUSES:
+            return True
+        with self._lock:
+            if self._downloads.get(job_id, 0) > 0:
+                return True
+        if job is None and self.broker is not None:
+            try:
+                remote = self.broker.get(job_id)
+            except Exception as e:
+                print(f"[retention] Could not check {job_id} with the broker, keeping it: {e}")
+                return True
+            return remote is not None and remote['status'] in ACTIVE_STATUSES
+        return False
+
+    def scan(self):
+        """
+        Collect every job with output on disk, including output left by
+        jobs from before a restart, which are only known by their files.
+        """
+        entries = {}
+        for name in os.listdir(self.output_dir):
+            path = os.path.join(self.output_dir, name)
+            # Job directories are named <job_id>, archives <hostname>_<job_id>.zip,
+            # crawl reports crawl_report_<job_id>.json
+            if name.endswith('.zip') or name.endswith('.json'):
+                job_id = os.path.splitext(name)[0].rsplit('_', 1)[-1]
+            else:
+                job_id = name
+            try:
+                size, mtime = path_size(path), os.path.getmtime(path)
+            except OSError:
+                # Removed while scanning
+                continue
+            entry = entries.setdefault(job_id, {'job_id': job_id, 'paths': [], 'bytes': 0, 'mtime': 0})
+            entry['paths'].append(path)
+            entry['bytes'] += size
+            entry['mtime'] = max(entry['mtime'], mtime)
+
+        with self._lock:
+            for job_id, entry in entries.items():
+                entry['last_access'] = self._last_access.get(job_id, entry['mtime'])
+                entry['downloads'] = self._downloads.get(job_id, 0)
+        for job_id, entry in entries.items():
+            job = self.jobs.get(job_id, {})
+            entry['status'] = job.get('status', 'unknown')
+            entry['protected'] = self.is_protected(job_id)
+            entry['ttl_hours'] = parse_ttl_hours(job.get('options', {}).get('retentionHours'), self.ttl_hours)
+        return entries
+
+    def evict(self, job_id, paths, reason):
+        for path in paths:
+            remove_path(path)
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job['status'] = 'expired'
+            job['expired_reason'] = reason
+            job.pop('output_path', None)
+        with self._lock:
+            self._last_access.pop(job_id, None)
+            self._downloads.pop(job_id, None)
+        if self.on_evict:
+            self.on_evict(job_id)
+        print(f"[retention] Removed output of {job_id} ({reason})")
+
+    def sweep(self):
+        """Delete expired job output, then evict the least recently used jobs until under quota"""
+        entries = self.scan()
+        now = time.time()
+        evicted = []
+
+        for job_id, entry in list(entries.items()):
+            if entry['protected']:
+                continue
+            if now - entry['last_access'] > entry['ttl_hours'] * 3600:
+                self.evict(job_id, entry['paths'], 'ttl')
+                evicted.append(job_id)
+                del entries[job_id]
+
+        total = sum(entry['bytes'] for entry in entries.values())
+        if total > self.quota_bytes:
+            for entry in sorted(entries.values(), key=lambda e: e['last_access']):
+                if total <= self.quota_bytes:
+                    break
+                if entry['protected']:
+                    continue
+                self.evict(entry['job_id'], entry['paths'], 'quota')
+                evicted.append(entry['job_id'])
+                total -= entry['bytes']
+
+        return evicted
+
+    def drop_site(self, job_id):
+        """Remove the unpacked site of a job once its ZIP exists"""
+        job = self.jobs.get(job_id, {})
+        zip_path = job.get('zip_path')
+        if not self.drop_site_dir or not zip_path or not os.path.exists(zip_path):
+            return
+        remove_path(os.path.join(self.output_dir, job_id))
+        job.pop('output_path', None)
+
+    def usage(self):
+        """Disk usage report for the admin endpoint"""
+        entries = self.scan()
+        disk = shutil.disk_usage(self.output_dir)
+        jobs = sorted(entries.values(), key=lambda e: e['last_access'], reverse=True)
+        for entry in jobs:
+            entry.pop('paths')
+        return {
+            'output_dir': self.output_dir,
+            'used_bytes': sum(entry['bytes'] for entry in jobs),
+            'quota_bytes': self.quota_bytes,
+            'ttl_hours': self.ttl_hours,
+            'drop_site_dir': self.drop_site_dir,
+            'disk_total_bytes': disk.total,
+            'disk_free_bytes': disk.free,
+            'jobs': jobs
+        }
+
+    def request_sweep(self):
+        """Have the background thread sweep now, without waiting for it"""
+        self._wake.set()
+
+    def start(self, interval=300):
+        """Sweep periodically in a daemon thread, or sooner when request_sweep() is called"""
+        def run():
+            while True:
+                self._wake.wait(interval)
+                self._wake.clear()
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"[retention] Sweep failed: {e}")
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
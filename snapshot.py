@@ -0,0 +1,102 @@
+# DOM snapshots - streams the serialized page from the browser straight to disk
+# The page serializes itself once into a string that stays in the browser; Python pulls
+# it in chunks, applies the string-level fixes with streaming replacers and writes each
+# chunk out, so no process ever holds more than one chunk of a large page on this side.
+
+import os
+
+# Characters pulled from the browser per evaluate call
+CHUNK_CHARS = 1024 * 1024
+
+SNAPSHOT_JS = '''() => {
+    window.__wixSnapshot = document.documentElement.outerHTML;
+    return window.__wixSnapshot.length;
+}'''
+CHUNK_JS = '''([start, size]) => {
+    const text = window.__wixSnapshot;
+    let end = Math.min(start + size, text.length);
+    // Don't split a surrogate pair between chunks
+    const code = text.charCodeAt(end - 1);
+    if (end < text.length && code >= 0xD800 && code <= 0xDBFF) {
+        end -= 1;
+    }
+    return [text.slice(start, end), end];
+}'''
+RELEASE_JS = '() => { delete window.__wixSnapshot; }'
+
+
+class StreamReplacer:
+    """
+    str.replace(old, new) over a stream of chunks, with the same result as on the whole string.
+    Text that could be the start of a match is held back until the next chunk arrives.
+    """
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.pending = ''
+
+    def feed(self, text):
+        buffer = self.pending + text
+        parts = []
+        pos = 0
+        while True:
+            index = buffer.find(self.old, pos)
+            if index < 0:
+                break
+            parts.append(buffer[pos:index])
+            parts.append(self.new)
+            pos = index + len(self.old)
+        # Never hold back replaced text, str.replace doesn't rescan its output either
+        keep = max(pos, len(buffer) - len(self.old) + 1)
+        parts.append(buffer[pos:keep])
+        self.pending = buffer[keep:]
+        return ''.join(parts)
+
+    def flush(self):
+        rest, self.pending = self.pending, ''
+        return rest
+
+
+class StreamPipeline:
+    """A chain of StreamReplacers, applied in order like consecutive str.replace calls"""
+
+    def __init__(self, replacements):
+        self.stages = [StreamReplacer(old, new) for old, new in replacements if old]
+
+    def feed(self, text):
+        for stage in self.stages:
+            text = stage.feed(text)
+        return text
+
+    def flush(self):
+        text = ''
+        for stage in self.stages:
+            text = stage.feed(text) + stage.flush()
+        return text
+
+
+async def write_snapshot(page, path, replacements, prefix='', chunk_chars=CHUNK_CHARS):
+    """
+    Serialize the page's document into path, applying replacements on the way.
+    The stream goes to path + '.part' and replaces path only once complete, so a
+    failed snapshot never leaves a truncated page behind.
+    """
+    pipeline = StreamPipeline(replacements)
+    part = path + '.part'
+    length = await page.evaluate(SNAPSHOT_JS)
+    try:
+        with open(part, 'w', encoding='utf-8') as f:
+            f.write(prefix)
+            start = 0
+            while start < length:
+                chunk, start = await page.evaluate(CHUNK_JS, [start, chunk_chars])
+                f.write(pipeline.feed(chunk))
+            f.write(pipeline.flush())
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    finally:
+        await page.evaluate(RELEASE_JS)
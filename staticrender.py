@@ -0,0 +1,192 @@
+# Static rendering fast path - converts the server-side rendered HTML without a browser
+# Wix already ships the page content in its SSR HTML, so text-heavy pages can skip Chromium.
+
+import difflib
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from fixers import static_selectors
+from fonts import FontPipeline
+from ratelimit import limited_get
+from wixscraper import download_images, image_file_name, page_key, get_page_metatags, finalize_html
+
+
+# Minimum text similarity between the static and browser render of the sample page
+STATIC_MATCH_THRESHOLD = 0.9
+# Minimum overlap of the images of both renders of the sample page
+STATIC_IMAGE_THRESHOLD = 0.9
+
+# Static renders save images under their own names, never reusing (or overwriting) the browser's
+STATIC_IMAGE_SUFFIX = '-static'
+
+# Transform part of a Wix image url (.../media/<id>/v1/fill/w_49,h_33,...,blur_2/<name>).
+# The SSR markup points at a small blurred placeholder, the static path downloads the original.
+WIX_IMAGE_TRANSFORM_RE = re.compile(r'(/media/[^/]+)/v1/.*$')
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+}
+
+def fetch_static_html(url):
+    # Get the server-side rendered HTML of a page
+    r = limited_get(url, headers=HEADERS, allow_redirects=True, timeout=60)
+    r.raise_for_status()
+    return r.text, r.url
+
+def needs_browser(soup, disabledFixers=()):
+    # Pages containing the widget of an enabled fixer need the browser (see fixers.py)
+    for selector in static_selectors(disabledFixers):
+        if soup.select_one(selector) is not None:
+            return True
+    return False
+
+# Static version of delete_wix
+def delete_wix(soup):
+    element = soup.find(id='WIX_ADS')
+    if element is not None:
+        element.decompose()
+
+    for element in soup.find_all('style'):
+        if element.string and '--wix-ads' in element.string:
+            element.string = element.string.replace('--wix-ads', '', 1)
+
+    for element in soup.find_all('span'):
+        if 'Made with Wix' in element.get_text():
+            element.decompose()
+
+    for element in soup.find_all(['script', 'link']):
+        element.decompose()
+
+def add_head_tag(soup, name, **attrs):
+    element = soup.new_tag(name, attrs=attrs)
+    soup.head.append(element)
+    return element
+
+def sharp_image_url(url):
+    return WIX_IMAGE_TRANSFORM_RE.sub(r'\1', url)
+
+def static_fix_page(soup, url, hostname, blockPrimaryFolder, darkWebsite, forceDownloadAgain, metatags,
+                    fontPipeline=None, assetCache=None, budget=None, media=None, downloadImages=True):
+    """
+    Apply the fix_page transforms to parsed SSR HTML.
+    Returns the final html and the absolute links found on the page.
+    Without downloadImages, images are only pointed at their local files (for sample renders).
+    """
+    if soup.head is None:
+        soup.html.insert(0, soup.new_tag('head'))
+
+    key = page_key(url, hostname)
+    print("Current page (static): " + key)
+
+    links = [urljoin(url, a['href']) for a in soup.find_all('a', href=True)]
+
+    delete_wix(soup)
+
+    for element in soup.find_all('style'):
+        css = element.string or ''
+        # In every font-face, add font-display: swap;
+        css = css.replace('@font-face {', '@font-face { font-display: swap;')
+        css = css.replace('--wix-ads', '', 1)
+        element.string = css
+        # Remove data-href from every style tag
+        del element['data-href']
+        del element['data-url']
+
+    # Make all images local. The SSR markup points at blurred placeholders
+    # which the Wix runtime swaps out, so request the original instead.
+    images = soup.find_all('img', src=True)
+    for element in images:
+        element['src'] = sharp_image_url(urljoin(url, element['src']))
+    if downloadImages:
+        download_images([element['src'] for element in images], hostname, forceDownloadAgain, assetCache, budget,
+                        nameSuffix=STATIC_IMAGE_SUFFIX)
+    for element in images:
+        element['src'] = '/images/' + image_file_name(element['src'], STATIC_IMAGE_SUFFIX)
+        del element['srcset']
+
+    # Make videos, audio and background images local
+    if media is not None:
+        media.localize_soup(soup, url)
+
+    # Make all fonts local
+    if fontPipeline is None:
+        fontPipeline = FontPipeline(hostname + '/fonts', forceDownloadAgain, assetCache=assetCache)
+    fontPipeline.add_text(soup.body.get_text() if soup.body is not None else '')
+    styles = soup.find_all('style')
+    texts = fontPipeline.process_styles([element.string or '' for element in styles], referenced_text=str(soup))
+    for element, css in zip(styles, texts):
+        element.string = css
+
+    # Delete all meta tags
+    for element in soup.find_all('meta'):
+        element.decompose()
+
+    title, description, keywords, canonical, image, author = get_page_metatags(key, metatags)
+
+    add_head_tag(soup, 'title').string = title
+    add_head_tag(soup, 'meta', name='title', content=title)
+    add_head_tag(soup, 'meta', property='og:title', content=title)
+    add_head_tag(soup, 'meta', name='description', content=description)
+    add_head_tag(soup, 'meta', property='og:description', content=description)
+    add_head_tag(soup, 'meta', name='keywords', content=keywords)
+    add_head_tag(soup, 'link', rel='canonical', href=canonical)
+    add_head_tag(soup, 'meta', name='viewport', content='width=device-width, initial-scale=1.0')
+    add_head_tag(soup, 'meta', name='robots', content='index, follow')
+
+    # Serialize like document.documentElement.outerHTML
+    html = str(soup.html) if soup.html is not None else str(soup)
+
+    return finalize_html(html, hostname, blockPrimaryFolder, darkWebsite), links
+
+def render_static_page(url, hostname, blockPrimaryFolder, darkWebsite, forceDownloadAgain, metatags,
+                       fontPipeline=None, assetCache=None, budget=None, media=None, disabledFixers=(),
+                       downloadImages=True):
+    """
+    Convert a page without the browser.
+    Returns the final html and the links found on the page, or None if the page needs the browser.
+    """
+    html, final_url = fetch_static_html(url)
+    if budget is not None:
+        budget.add_bytes(len(html))
+    soup = BeautifulSoup(html, 'html.parser')
+    if soup.html is None or needs_browser(soup, disabledFixers):
+        return None
+    return static_fix_page(soup, final_url, hostname, blockPrimaryFolder, darkWebsite, forceDownloadAgain, metatags,
+                           fontPipeline, assetCache, budget, media, downloadImages)
+
+def page_words(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup.find_all(['style', 'script']):
+        element.decompose()
+    return soup.get_text(' ').split()
+
+def compare_with_browser(static_html, browser_html):
+    """
+    Compare the visible text of the static and browser renders of a page.
+    Returns a similarity ratio between 0 and 1.
+    """
+    matcher = difflib.SequenceMatcher(None, page_words(static_html), page_words(browser_html), autojunk=False)
+    return matcher.ratio()
+
+def page_images(html):
+    # Local image names of a render, without the static suffix
+    soup = BeautifulSoup(html, 'html.parser')
+    names = set()
+    for element in soup.find_all('img', src=True):
+        name = element['src'].split('/')[-1].rsplit('.', 1)[0]
+        if name.endswith(STATIC_IMAGE_SUFFIX):
+            name = name[:-len(STATIC_IMAGE_SUFFIX)]
+        names.add(name)
+    return names
+
+def compare_images(static_html, browser_html):
+    """
+    Compare the images of the static and browser renders of a page.
+    Returns the share of images found in both, between 0 and 1.
+    """
+    static_images, browser_images = page_images(static_html), page_images(browser_html)
+    if not static_images and not browser_images:
+        return 1.0
+    return len(static_images & browser_images) / len(static_images | browser_images)
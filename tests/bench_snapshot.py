@@ -0,0 +1,96 @@
+# Peak memory of writing a page: outerHTML + finalize_html against write_snapshot
+# The page lives in a stand-in for the browser; whatever evaluate returns is copied out,
+# like a result coming over the browser connection. tracemalloc measures this process only.
+#
+# Run with: python tests/bench_snapshot.py [page MB]
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from snapshot import write_snapshot, SNAPSHOT_JS, CHUNK_JS, RELEASE_JS  # noqa: E402
+from wixscraper import finalize_html, finalize_replacements, DOCTYPE  # noqa: E402
+
+HOSTNAME = 'example.wixsite.com'
+OUTER_HTML_JS = 'document.documentElement.outerHTML'
+
+
+def transfer(text):
+    # A fresh copy, as decoded from the browser's reply
+    return text.encode('utf-8').decode('utf-8')
+
+
+class BrowserPage:
+    def __init__(self, html):
+        self.html = html
+        self.snapshot = None
+
+    async def evaluate(self, script, arg=None):
+        if script == OUTER_HTML_JS:
+            return transfer(self.html)
+        if script == SNAPSHOT_JS:
+            self.snapshot = self.html
+            return len(self.snapshot)
+        if script == CHUNK_JS:
+            start, size = arg
+            end = min(start + size, len(self.snapshot))
+            return [transfer(self.snapshot[start:end]), end]
+        if script == RELEASE_JS:
+            self.snapshot = None
+            return None
+        raise ValueError(script)
+
+
+def generate_page(megabytes):
+    section = ('<section class="wixui-section"><a href="https://' + HOSTNAME + '/about">About</a><br>'
+               '<p style="font-family: avenir">Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 4 +
+               '</p><img src="https://static.wixstatic.com/media/abc~mv2.jpg"></section>\n')
+    body = section * (megabytes * 1024 * 1024 // len(section) + 1)
+    return '<html><head><title>Bench</title></head><body>' + body + '</body></html>'
+
+
+async def outer_html(page, path):
+    html = finalize_html(await page.evaluate(OUTER_HTML_JS), HOSTNAME, '', False)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html)
+
+
+async def snapshot(page, path):
+    await write_snapshot(page, path, finalize_replacements(HOSTNAME, '', False), prefix=DOCTYPE)
+
+
+def measure(write, page, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    asyncio.run(write(page, path))
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, seconds
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    page = BrowserPage(generate_page(megabytes))
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {name: os.path.join(directory, name + '.html') for name in ('outer_html', 'snapshot')}
+        results = {
+            'outer_html': measure(outer_html, page, paths['outer_html']),
+            'snapshot': measure(snapshot, page, paths['snapshot'])
+        }
+        with open(paths['outer_html'], encoding='utf-8') as a, open(paths['snapshot'], encoding='utf-8') as b:
+            identical = a.read() == b.read()
+
+    print(f"Page: {len(page.html) / 1024 / 1024:.1f} MB, outputs identical: {identical}")
+    for name, (peak, seconds) in results.items():
+        print(f"{name:>10}: peak {peak / 1024 / 1024:7.1f} MB, {seconds:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
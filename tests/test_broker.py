@@ -0,0 +1,92 @@
+# SQLite job broker: claiming, leases, the attempt cap and ownership of results
+#
+# Run with: python -m unittest discover tests (or pytest)
+
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from broker import SQLiteBroker  # noqa: E402
+
+
+class SQLiteBrokerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.broker = SQLiteBroker(os.path.join(self.directory.name, 'broker.db'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def end_events(self, job_id):
+        events, _ = self.broker.events_since()
+        return [event['data'] for event in events if event['job_id'] == job_id and event['event'] == 'end']
+
+    def test_claim_takes_oldest_queued_job_once(self):
+        self.broker.enqueue('first', {'url': 'https://a.example'})
+        self.broker.enqueue('second', {'url': 'https://b.example'})
+
+        self.assertEqual(self.broker.claim('w1'), {'id': 'first', 'payload': {'url': 'https://a.example'}})
+        self.assertEqual(self.broker.claim('w2')['id'], 'second')
+        self.assertIsNone(self.broker.claim('w3'))
+        self.assertEqual(self.broker.get('first')['worker'], 'w1')
+        self.assertEqual(self.broker.get('first')['status'], 'running')
+
+    def test_heartbeat_keeps_the_lease(self):
+        self.broker.enqueue('job', {})
+        self.broker.claim('w1')
+
+        self.assertTrue(self.broker.heartbeat('job', 'w1'))
+        self.assertIsNone(self.broker.claim('w2'))
+
+    def test_expired_lease_is_claimed_by_another_worker(self):
+        self.broker.enqueue('job', {})
+        self.broker.claim('w1', lease_seconds=-1)
+
+        self.assertEqual(self.broker.claim('w2')['id'], 'job')
+        self.assertEqual(self.broker.get('job')['worker'], 'w2')
+        self.assertFalse(self.broker.heartbeat('job', 'w1'))
+
+    def test_stale_owner_cannot_finish_the_job(self):
+        self.broker.enqueue('job', {})
+        self.broker.claim('w1', lease_seconds=-1)
+        self.broker.claim('w2')
+
+        self.assertFalse(self.broker.complete('job', 'w1', {'zip_path': 'stale.zip'}))
+        self.assertFalse(self.broker.fail('job', 'w1', 'stale'))
+        self.assertEqual(self.broker.get('job')['status'], 'running')
+
+        self.assertTrue(self.broker.complete('job', 'w2', {'zip_path': 'site.zip'}))
+        job = self.broker.get('job')
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual(job['result'], {'zip_path': 'site.zip'})
+        self.assertEqual(self.end_events('job'), ['completed'])
+
+        # Finished jobs can't be finished again
+        self.assertFalse(self.broker.fail('job', 'w2', 'late'))
+
+    def test_job_fails_after_max_attempts(self):
+        self.broker.enqueue('job', {})
+        self.broker.claim('w1', lease_seconds=-1, max_attempts=2)
+        self.broker.claim('w2', lease_seconds=-1, max_attempts=2)
+
+        self.assertIsNone(self.broker.claim('w3', max_attempts=2))
+        job = self.broker.get('job')
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('2 attempts', job['error'])
+        self.assertEqual(self.end_events('job'), ['failed'])
+
+    def test_failed_job_is_skipped_for_the_next_one(self):
+        self.broker.enqueue('lost', {})
+        self.broker.enqueue('next', {})
+        self.broker.claim('w1', lease_seconds=-1, max_attempts=1)
+
+        self.assertEqual(self.broker.claim('w2', max_attempts=1)['id'], 'next')
+        self.assertEqual(self.broker.get('lost')['status'], 'failed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# Startup budget of the web app
+# Importing app must stay cheap: gunicorn workers are booted on every restart and
+# autoscale, and the scraper's dependencies are only loaded by the jobs that run it.
+#
+# Run with: python -m unittest discover tests (or pytest)
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds allowed for importing app in a fresh interpreter
+IMPORT_BUDGET_SECONDS = float(os.environ.get('IMPORT_BUDGET_SECONDS', 1.0))
+
+# Loaded by the first conversion, never by the import
+HEAVY_MODULES = ('wixscraper', 'batch', 'assetcache', 'playwright', 'PIL', 'requests', 'bs4', 'fontTools')
+
+MEASURE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+seconds = time.perf_counter() - started
+print(json.dumps({'seconds': seconds, 'modules': [name for name in %r if name in sys.modules]}))
+''' % (HEAVY_MODULES,)
+
+
+def flask_installed():
+    try:
+        import flask  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@unittest.skipUnless(flask_installed(), 'Flask is not installed')
+class StartupTest(unittest.TestCase):
+    def import_app(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, OUTPUT_DIR=os.path.join(directory, 'sites'),
+                       ASSET_CACHE_DIR=os.path.join(directory, 'cache'), BROKER_URL='')
+            result = subprocess.run([sys.executable, '-c', MEASURE], cwd=ROOT, env=env,
+                                    capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_import_loads_no_scraper_dependencies(self):
+        self.assertEqual(self.import_app()['modules'], [])
+
+    def test_import_within_budget(self):
+        # Best of three, so one slow run on a busy machine doesn't fail the test
+        seconds = min(self.import_app()['seconds'] for _ in range(3))
+        self.assertLess(seconds, IMPORT_BUDGET_SECONDS)
+
+
+if __name__ == '__main__':
+    unittest.main()
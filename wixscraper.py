@@ -3,11 +3,21 @@
 
 import json
 from urllib.parse import urlparse
-from playwright.async_api import async_playwright
 import asyncio
 import os
-import requests
-from PIL import Image
+import contextlib
+import time
+from fonts import FontPipeline
+from assetcache import fetch_asset, route_through_cache, CACHED_RESOURCE_TYPES
+from ratelimit import limited_goto, throttle_responses
+from budget import JobBudget
+from crawlreport import CrawlReport
+from snapshot import write_snapshot
+from media import MediaLocalizer
+from pagetemplates import TemplateCache, CONTENT_STATE_JS, PENDING_IMAGES_JS
+from fixers import FIXERS, register_fixer, detect_fixers, run_fixers, parse_fixer_names
+
+DOCTYPE = '<!DOCTYPE html>'
 
 # Scroll to the bottom to load all content
 async def scroll_to_bottom(page):
@@ -67,230 +77,224 @@ async def delete_wix(page):
         }
     }''')
 
-async def fix_gallery(page):
-    # If pro-gallery is a class on the page, then we need to fix the gallery
-    gallery = await page.query_selector('.pro-gallery')
-
-    if gallery is not None:
-        print("Found gallery! Fixing..")
-        
-        # Import slick.carousel
-        await page.add_script_tag(url='https://cdn.jsdelivr.net/npm/jquery@3.6.4/dist/jquery.min.js')
-        await page.add_style_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick.css')
-        await page.add_style_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick-theme.css')
-        await page.add_script_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick.min.js')
-
-        # Get all img links
-        img_links = await page.eval_on_selector_all('img', 'nodes => nodes.map(n => n.src)')
+@register_fixer('gallery', ['.pro-gallery'], cost=3)
+async def fix_gallery(page, **context):
+    # Replace the pro-gallery with a slick carousel
+    print("Found gallery! Fixing..")
     
-        # Create the carousel
-        await page.evaluate('''() => {
-            const element = document.createElement('div');
-            element.className = 'slick-carousel';
-            document.querySelector('.pro-gallery').parentNode.parentNode.insertBefore(element, document.querySelector('.pro-gallery').parentNode);
-        }''')
-
-        # Delete all siblings of the slick carousel
-        await page.evaluate('''() => {
-            const element = document.querySelector('.slick-carousel');
-            while (element.nextSibling) {
-                element.nextSibling.parentNode.removeChild(element.nextSibling);
-            }
-        }''')
-
-        # Add the images to the carousel
-        for link in img_links:
-            await page.evaluate(f'''() => {{
-                const element = document.createElement('img');
-                element.src = '{link}';
-                element.alt = 'Gallery Image';
-                document.querySelector('.slick-carousel').appendChild(element);
-            }}''')
-
-        # Add the above evaluation as a script tag
-        await page.add_script_tag(content='''
-        window.addEventListener('DOMContentLoaded', function() {
-        var $jq = jQuery.noConflict();
-        $jq(document).ready(function () {
-            $jq('.slick-carousel').slick({
-                dots: true,
-                infinite: true,
-                speed: 300,
-                slidesToShow: 2,
-                responsive: [
-                    {
-                    breakpoint: 1024,
-                    settings: {
-                        slidesToShow: 1,
-                    }
-                    },
-                    {
-                    breakpoint: 600,
-                    settings: {
-                        slidesToShow: 1,
-                    }
-                    }
-                ]
-            });
+    # Import slick.carousel
+    await page.add_script_tag(url='https://cdn.jsdelivr.net/npm/jquery@3.6.4/dist/jquery.min.js')
+    await page.add_style_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick.css')
+    await page.add_style_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick-theme.css')
+    await page.add_script_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick.min.js')
+
+    # Build the carousel inside the page, the image links never leave the browser
+    await page.evaluate('''() => {
+        // Get all img links
+        const links = Array.from(document.querySelectorAll('img')).map(n => n.src);
+
+        // Create the carousel
+        const carousel = document.createElement('div');
+        carousel.className = 'slick-carousel';
+        document.querySelector('.pro-gallery').parentNode.parentNode.insertBefore(carousel, document.querySelector('.pro-gallery').parentNode);
+
+        // Delete all siblings of the slick carousel
+        while (carousel.nextSibling) {
+            carousel.nextSibling.parentNode.removeChild(carousel.nextSibling);
+        }
+
+        // Add the images to the carousel
+        for (const link of links) {
+            const element = document.createElement('img');
+            element.src = link;
+            element.alt = 'Gallery Image';
+            carousel.appendChild(element);
+        }
+    }''')
+
+    # Add the above evaluation as a script tag
+    await page.add_script_tag(content='''
+    window.addEventListener('DOMContentLoaded', function() {
+    var $jq = jQuery.noConflict();
+    $jq(document).ready(function () {
+        $jq('.slick-carousel').slick({
+            dots: true,
+            infinite: true,
+            speed: 300,
+            slidesToShow: 2,
+            responsive: [
+                {
+                breakpoint: 1024,
+                settings: {
+                    slidesToShow: 1,
+                }
+                },
+                {
+                breakpoint: 600,
+                settings: {
+                    slidesToShow: 1,
+                }
+                }
+            ]
         });
-        });''')
-
-async def fix_googlemap(page, mapData):
-    # Get the one titled = "Google Maps"
-    googlemap = await page.query_selector('wix-iframe[title="Google Maps"]')
-
-    if googlemap is not None:
-        print("Found Google Maps! Fixing..")
-
-        # Import leaflet
-        await page.add_style_tag(url='https://cdnjs.cloudflare.com/ajax/libs/leaflet/1.9.3/leaflet.css')
-
-        await page.evaluate('''() => {
-            const element = document.createElement('script');
-            element.src = 'https://cdnjs.cloudflare.com/ajax/libs/leaflet/1.9.3/leaflet.js';
-            document.querySelector('script').parentNode.insertBefore(element, document.querySelector('script').nextSibling);
-        }''')
-
-        # Add new style tag to the page
-        await page.add_style_tag(content='''
-        #map { height: 100%; }
-        html, body { height: 100%; margin: 0; padding: 0; }
-        :root {
-        --map-tiles-filter: brightness(0.6) invert(1) contrast(3) hue-rotate(200deg) saturate(0.3) brightness(0.7);
+    });
+    });''')
+
+@register_fixer('googlemap', ['wix-iframe[title="Google Maps"]'], cost=2,
+                static_selectors=['wix-iframe[title="Google Maps"]', 'iframe[title="Google Maps"]'])
+async def fix_googlemap(page, mapData, **context):
+    # Replace the wix-iframe titled "Google Maps" with a leaflet map
+    print("Found Google Maps! Fixing..")
+
+    # Import leaflet
+    await page.add_style_tag(url='https://cdnjs.cloudflare.com/ajax/libs/leaflet/1.9.3/leaflet.css')
+
+    await page.evaluate('''() => {
+        const element = document.createElement('script');
+        element.src = 'https://cdnjs.cloudflare.com/ajax/libs/leaflet/1.9.3/leaflet.js';
+        (document.head || document.body).appendChild(element);
+    }''')
+
+    # Add new style tag to the page
+    await page.add_style_tag(content='''
+    #map { height: 100%; }
+    html, body { height: 100%; margin: 0; padding: 0; }
+    :root {
+    --map-tiles-filter: brightness(0.6) invert(1) contrast(3) hue-rotate(200deg) saturate(0.3) brightness(0.7);
+    }
+    @media (prefers-color-scheme: dark) {
+        .map-tiles {
+            filter:var(--map-tiles-filter, none);
         }
-        @media (prefers-color-scheme: dark) {
-            .map-tiles {
-                filter:var(--map-tiles-filter, none);
-            }
-        }''')
-
-        # Add a new map div next to the google map
-        await page.evaluate('''() => {
-            const element = document.createElement('div');
-            element.id = 'map';
-            document.querySelector('iframe[title="Google Maps"]').parentNode.insertBefore(element, document.querySelector('iframe[title="Google Maps"]').nextSibling);
-        }''')
-
-        # Delete all siblings of the map div
-        await page.evaluate('''() => {
-            const element = document.querySelector('#map');
-            while (element.nextSibling) {
-                element.nextSibling.parentNode.removeChild(element.nextSibling);
-            }
-        }''')
+    }''')
 
-        content = '''
-        window.addEventListener('DOMContentLoaded', function() {
-        var map = L.map('map').setView([''' + mapData['latitude'] + ',' + mapData['longitude'] + '],' + mapData['zoom'] + ''');
-        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
-            attribution: '&copy; <a href="http://osm.org/copyright">OpenStreetMap</a> contributors',
-            className: 'map-tiles'
-        }).addTo(map);
-        L.marker([''' + mapData['mapMarker']['latitude'] + ',' + mapData['mapMarker']['longitude'] + ''']).addTo(map)
-            .bindPopup(" ''' + mapData['mapMarker']['popup'] + ''' ")
-            .openPopup();
-        });'''
-
-        await page.evaluate('''() => {
-            const element = document.createElement('script');
-            element.innerHTML = `''' + content + '''`;
-            document.querySelector('body').appendChild(element);
-        }''')
-
-        # Delete the google map iframe
-        await page.evaluate('''() => {
-            const element = document.querySelector('iframe[title="Google Maps"]');
-            element.parentNode.removeChild(element);
-        }''')
-
-        # Add preconnect to openstreetmap
-        await page.evaluate('''() => {
-            const element = document.createElement('link');
-            element.rel = 'preconnect';
-            element.href = 'https://a.tile.openstreetmap.org';
-            document.querySelector('head').appendChild(element);
-            element.href = 'https://b.tile.openstreetmap.org';
-            document.querySelector('head').appendChild(element);
-            element.href = 'https://c.tile.openstreetmap.org';
-            document.querySelector('head').appendChild(element);
-        }''')
-
-async def fix_slideshow(page):
-    gallery = await page.query_selector('.wixui-slideshow')
-
-    if gallery is not None:
-        print("Found Slideshow! Fixing..")
-        
-        # Import slick.carousel
-        await page.add_script_tag(url='https://cdn.jsdelivr.net/npm/jquery@3.6.4/dist/jquery.min.js')
-        await page.add_style_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick.css')
-        await page.add_style_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick-theme.css')
-        await page.add_script_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick.min.js')
-
-        await page.evaluate('''() => {
-            const element = document.createElement('div');
-            element.className = 'slick-carousel-slides';
-            document.querySelector('.wixui-slideshow').parentNode.parentNode.insertBefore(element, document.querySelector('.wixui-slideshow').parentNode);
-        }''')
-
-        # Give all images inside slideshow alt tags
-        await page.evaluate('''() => {
-            const elements = document.querySelectorAll('nav[aria-label="Slides"] li img');
-            for (const element of elements) {   
-                element.alt = 'Slideshow Image';
-            }
-        }''')
+    # Add a new map div next to the google map
+    await page.evaluate('''() => {
+        const element = document.createElement('div');
+        element.id = 'map';
+        document.querySelector('iframe[title="Google Maps"]').parentNode.insertBefore(element, document.querySelector('iframe[title="Google Maps"]').nextSibling);
+    }''')
 
-        slides = await page.query_selector_all('nav[aria-label="Slides"] li')
+    # Delete all siblings of the map div
+    await page.evaluate('''() => {
+        const element = document.querySelector('#map');
+        while (element.nextSibling) {
+            element.nextSibling.parentNode.removeChild(element.nextSibling);
+        }
+    }''')
 
-        # Ensure first slide is selected
-        await asyncio.sleep(5)
-        if slides:
-            await slides[0].click()
+    content = '''
+    window.addEventListener('DOMContentLoaded', function() {
+    var map = L.map('map').setView([''' + mapData['latitude'] + ',' + mapData['longitude'] + '],' + mapData['zoom'] + ''');
+    L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+        attribution: '&copy; <a href="http://osm.org/copyright">OpenStreetMap</a> contributors',
+        className: 'map-tiles'
+    }).addTo(map);
+    L.marker([''' + mapData['mapMarker']['latitude'] + ',' + mapData['mapMarker']['longitude'] + ''']).addTo(map)
+        .bindPopup(" ''' + mapData['mapMarker']['popup'] + ''' ")
+        .openPopup();
+    });'''
 
-            for slide in slides:
-                await slide.click()
-                await asyncio.sleep(5)
+    await page.evaluate('''() => {
+        const element = document.createElement('script');
+        element.innerHTML = `''' + content + '''`;
+        document.querySelector('body').appendChild(element);
+    }''')
+
+    # Delete the google map iframe
+    await page.evaluate('''() => {
+        const element = document.querySelector('iframe[title="Google Maps"]');
+        element.parentNode.removeChild(element);
+    }''')
+
+    # Add preconnect to openstreetmap
+    await page.evaluate('''() => {
+        const element = document.createElement('link');
+        element.rel = 'preconnect';
+        element.href = 'https://a.tile.openstreetmap.org';
+        document.querySelector('head').appendChild(element);
+        element.href = 'https://b.tile.openstreetmap.org';
+        document.querySelector('head').appendChild(element);
+        element.href = 'https://c.tile.openstreetmap.org';
+        document.querySelector('head').appendChild(element);
+    }''')
 
-                slide_content = await page.query_selector('div[data-testid="slidesWrapper"] > div')
-                parent = await page.evaluate('(slide_content) => slide_content.innerHTML', slide_content)
+# Clicks through every slide, so the most expensive fixer
+@register_fixer('slideshow', ['.wixui-slideshow'], cost=10)
+async def fix_slideshow(page, **context):
+    print("Found Slideshow! Fixing..")
+    
+    # Import slick.carousel
+    await page.add_script_tag(url='https://cdn.jsdelivr.net/npm/jquery@3.6.4/dist/jquery.min.js')
+    await page.add_style_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick.css')
+    await page.add_style_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick-theme.css')
+    await page.add_script_tag(url='https://cdnjs.cloudflare.com/ajax/libs/slick-carousel/1.9.0/slick.min.js')
 
-                await page.evaluate(f'''(parent) => {{
-                    const element = document.createElement('div');
-                    element.innerHTML = parent;
-                    document.querySelector('.slick-carousel-slides').appendChild(element);
-                }}''', parent)
+    await page.evaluate('''() => {
+        const element = document.createElement('div');
+        element.className = 'slick-carousel-slides';
+        document.querySelector('.wixui-slideshow').parentNode.parentNode.insertBefore(element, document.querySelector('.wixui-slideshow').parentNode);
+    }''')
 
-        # Delete all children of slidesWrapper
-        await page.evaluate('''() => {
-            const element = document.querySelector('div[data-testid="slidesWrapper"]');
-            while (element.firstChild) {
-                element.removeChild(element.firstChild);
-            }
-        }''')
-
-        # Move slick-carousel next to aria-label="Slideshow"
-        await page.evaluate('''() => {
-           const element = document.querySelector('.slick-carousel-slides');
-           document.querySelector('.wixui-slideshow').parentNode.insertBefore(element, document.querySelector('.wixui-slideshow').nextSibling);
-        }''')
-
-        await page.evaluate('''() => {
-           const element = document.querySelector('.wixui-slideshow');
-           document.querySelector('.slick-carousel-slides').className = element.className + ' slick-carousel-slides';
-           document.querySelector('.slick-carousel-slides').id = element.id;
-           element.parentNode.removeChild(element);
-        }''')
-
-        await page.add_style_tag(content='''
-        .slick-next {
-            z-index: 100;
-            right: 75px;
+    # Give all images inside slideshow alt tags
+    await page.evaluate('''() => {
+        const elements = document.querySelectorAll('nav[aria-label="Slides"] li img');
+        for (const element of elements) {   
+            element.alt = 'Slideshow Image';
         }
-        .slick-prev {
-            z-index: 100;
-            left: 75px;
-        }''')
+    }''')
+
+    slides = await page.query_selector_all('nav[aria-label="Slides"] li')
+
+    # Ensure first slide is selected
+    await asyncio.sleep(5)
+    if slides:
+        await slides[0].click()
+
+        for slide in slides:
+            await slide.click()
+            await asyncio.sleep(5)
+
+            # Copy the slide in the page instead of moving its innerHTML through Python
+            await page.evaluate('''() => {
+                const content = document.querySelector('div[data-testid="slidesWrapper"] > div');
+                const element = document.createElement('div');
+                for (const child of content.childNodes) {
+                    element.appendChild(child.cloneNode(true));
+                }
+                document.querySelector('.slick-carousel-slides').appendChild(element);
+            }''')
+
+    # Delete all children of slidesWrapper
+    await page.evaluate('''() => {
+        const element = document.querySelector('div[data-testid="slidesWrapper"]');
+        while (element.firstChild) {
+            element.removeChild(element.firstChild);
+        }
+    }''')
+
+    # Move slick-carousel next to aria-label="Slideshow"
+    await page.evaluate('''() => {
+       const element = document.querySelector('.slick-carousel-slides');
+       document.querySelector('.wixui-slideshow').parentNode.insertBefore(element, document.querySelector('.wixui-slideshow').nextSibling);
+    }''')
+
+    await page.evaluate('''() => {
+       const element = document.querySelector('.wixui-slideshow');
+       document.querySelector('.slick-carousel-slides').className = element.className + ' slick-carousel-slides';
+       document.querySelector('.slick-carousel-slides').id = element.id;
+       element.parentNode.removeChild(element);
+    }''')
+
+    await page.add_style_tag(content='''
+    .slick-next {
+        z-index: 100;
+        right: 75px;
+    }
+    .slick-prev {
+        z-index: 100;
+        left: 75px;
+    }''')
 
 slideFix = '''<script>
         window.addEventListener('DOMContentLoaded', function() {
@@ -342,37 +346,48 @@ lightModeFix = '''<style>
         }
     </style></head>'''
 
-async def makeLocalImages(page, hostname, forceDownloadAgain):
+def image_file_name(link, nameSuffix=''):
+    # Local webp file of an image url
+    return link.split('/')[-1].split('.')[0] + nameSuffix + '.webp'
+
+def download_images(imageLinks, hostname, forceDownloadAgain, assetCache=None, budget=None, nameSuffix=''):
+    # nameSuffix keeps the files of another renderer apart from the browser's
+    # PIL and Playwright are only imported once a conversion needs them, so importing this module stays cheap
+    from PIL import Image
+
     # Create images folder if it doesn't exist in hostname folder
     if not os.path.exists(hostname + '/images'):
         os.makedirs(hostname + '/images')
 
-    # Download all images
-    imageLinks = await page.eval_on_selector_all('img', 'nodes => nodes.map(n => n.src)')
-
     for link in imageLinks:
         # Skip data URIs (base64 encoded images)
         if link.startswith('data:'):
             continue
 
         # If a webp version of the image already exists, skip it
-        if not forceDownloadAgain and os.path.exists(hostname + '/images/' + link.split('/')[-1].split('.')[0] + '.webp'):
+        if not forceDownloadAgain and os.path.exists(hostname + '/images/' + image_file_name(link, nameSuffix)):
             continue
 
         try:
             imageName = link.split('/')[-1]
-            r = requests.get(link, allow_redirects=True)
-            open(hostname + '/images/' + imageName, 'wb').write(r.content)
+            data = fetch_asset(link, assetCache, budget=budget)
+            open(hostname + '/images/' + imageName, 'wb').write(data)
 
             # Convert each image to WebP
             im = Image.open(hostname + '/images/' + imageName)
-            im.save(hostname + '/images/' + imageName.split('.')[0] + '.webp', 'webp')
+            im.save(hostname + '/images/' + image_file_name(link, nameSuffix), 'webp')
 
             # Delete the original image
             os.remove(hostname + '/images/' + imageName)
         except Exception as e:
             print(f"Error downloading image {link}: {e}")
 
+async def makeLocalImages(page, hostname, forceDownloadAgain, assetCache=None, budget=None):
+    # Download all images
+    imageLinks = await page.eval_on_selector_all('img', 'nodes => nodes.map(n => n.src)')
+    # On a thread, so rate limit backoff doesn't stall the event loop
+    await asyncio.to_thread(download_images, imageLinks, hostname, forceDownloadAgain, assetCache, budget)
+
     # Replace all image links with the local image links
     await page.evaluate('''() => {
         const elements = document.querySelectorAll('img');
@@ -382,86 +397,178 @@ async def makeLocalImages(page, hostname, forceDownloadAgain):
         }
     }''')
 
-async def makeFontsLocal(page, hostname, forceDownloadAgain):
-    # Create a fonts folder if it doesn't exist in hostname folder
-    if not os.path.exists(hostname + '/fonts'):
-        os.makedirs(hostname + '/fonts')
-
-    # Download all fonts, which are parastorage links
-    fontLinks = await page.eval_on_selector_all(
-        'style',
-        '''nodes => nodes
-            .map(n => typeof n.innerText === 'string' ? n.innerText.match(/url\\((.*?)\\)/g) : [])
-            .flat()
-            .filter(x => x)'''
-    )
-
-    # Get all url("//static.parastorage.com...") links
-    fontLinks = [link for link in fontLinks if link is not None and 'static.parastorage.com' in link]
-
-    for link in fontLinks:
-        # Only get if the link is a font
-        if 'woff' not in link and 'woff2' not in link and 'ttf' not in link and 'eot' not in link and 'otf' not in link and 'svg' not in link:
-            continue
-        
-        # Remove anything before the link
-        parts = link.split('static.parastorage.com')
-        if len(parts) < 2:
-            continue
-        link = 'static.parastorage.com' + parts[1]
-        # Get the font name
-        fontName = link.split('/')[-1].split(')')[0]
-        fontName = fontName.split('?')[0]
-        fontName = fontName.split('#')[0]
-        fontName = fontName.replace('"', '')
-        
-        # If the font already exists, skip it
-        if not forceDownloadAgain and os.path.exists(hostname + '/fonts/' + fontName):
-            continue
-        
-        try:
-            r = requests.get("https://" + link, allow_redirects=True)
-            open(hostname + '/fonts/' + fontName, 'wb').write(r.content)
-        except Exception as e:
-            print(f"Error downloading font {link}: {e}")
-
-    # Replace all font links with the local font links
-    await page.evaluate('''() => {
-        const elements = document.querySelectorAll('style');
-        for (const element of elements) {
-            if (element && typeof element.innerText === 'string' && element.innerText.includes('static.parastorage.com')) {
-                const fontLinks = element.innerText.match(/url\\((.*?)\\)/g);
-                if (Array.isArray(fontLinks)) {
-                    for (const link of fontLinks) {
-                        if (
-                            link.includes('woff') || link.includes('woff2') ||
-                            link.includes('ttf') || link.includes('eot') ||
-                            link.includes('otf') || link.includes('svg')
-                        ) {
-                            let fontName = link.substring(link.lastIndexOf('/') + 1, link.lastIndexOf(')'))
-                                .split('?')[0].split('#')[0].replace(/\"/g, '');
-                            element.innerText = element.innerText.replace(link, 'url(\"/fonts/' + fontName + '\")');
-                        }
-                    }
-                }
+    # Number of images on the page
+    return len([link for link in imageLinks if not link.startswith('data:')])
+
+# Values of the font properties (and custom properties, which Wix uses for its font presets)
+# of every CSS rule and style attribute. null when a stylesheet can't be read, then all faces are kept.
+FONT_DECLARATIONS_JS = '''() => {
+    const values = [];
+    const collect = style => {
+        for (let i = 0; i < style.length; i++) {
+            if (style[i].startsWith('font') || style[i].startsWith('--')) {
+                values.push(style.getPropertyValue(style[i]));
+            }
+        }
+    };
+    const walk = rules => {
+        for (const rule of rules) {
+            if (rule instanceof CSSFontFaceRule) {
+                continue;
+            }
+            if (rule.style) {
+                collect(rule.style);
             }
+            if (rule.cssRules) {
+                walk(rule.cssRules);
+            }
+        }
+    };
+    for (const sheet of document.styleSheets) {
+        try {
+            walk(sheet.cssRules);
+        } catch (e) {
+            return null;
         }
+    }
+    document.querySelectorAll('[style]').forEach(element => collect(element.style));
+    // Weights and styles of the browser's default stylesheet
+    if (document.querySelector('b, strong, h1, h2, h3, h4, h5, h6, th')) {
+        values.push('bold');
+    }
+    if (document.querySelector('i, em, cite, dfn, var, address')) {
+        values.push('italic');
+    }
+    return values;
+}'''
+
+async def makeFontsLocal(page, hostname, forceDownloadAgain, fontPipeline=None, templates=None):
+    if fontPipeline is None:
+        fontPipeline = FontPipeline(hostname + '/fonts', forceDownloadAgain)
+
+    # Faces the browser loaded for this page, once pending loads have settled
+    usedFaces = await page.evaluate('''async () => {
+        if (!document.fonts) {
+            return [];
+        }
+        await document.fonts.ready;
+        return Array.from(document.fonts).filter(f => f.status === 'loaded').map(f => [f.family, f.weight, f.style]);
     }''')
+    # Font declarations of every rule, so faces needed only by hover states, menus or lightboxes are kept
+    declarations = await page.evaluate(FONT_DECLARATIONS_JS)
+    if declarations is None:
+        # A stylesheet couldn't be read, keep every face
+        usedFaces = []
+
+    if fontPipeline.subset:
+        fontPipeline.add_text(await page.evaluate('document.body ? document.body.textContent : ""'))
+
+    # Download the fonts and replace all font links with the local font links
+    if templates is not None:
+        # Styles shared with earlier pages are rewritten from memory
+        key = repr((sorted(map(tuple, usedFaces)), sorted(set(declarations)) if declarations is not None else None))
+        await templates.rewrite_styles(
+            page, lambda styles: fontPipeline.process_styles(styles, used=usedFaces, declarations=declarations), key)
+        return
+
+    styles = await page.eval_on_selector_all('style', 'nodes => nodes.map(n => n.textContent)')
+    # Font downloads are synchronous, keep them off the event loop shared with other sites
+    styles = await asyncio.to_thread(fontPipeline.process_styles, styles, used=usedFaces, declarations=declarations)
+    await page.eval_on_selector_all('style', '''(nodes, styles) => nodes.forEach((n, i) => {
+        if (n.textContent !== styles[i]) {
+            n.textContent = styles[i];
+        }
+    })''', styles)
 
-async def fix_page(page, wait, hostname, blockPrimaryFolder, darkWebsite, forceDownloadAgain, metatags, mapData):
-    # Get the current page
-    url_parts = page.url.split(hostname)
+def page_key(url, hostname):
+    # Get the metatags key of a page url
+    url_parts = url.split(hostname)
     key = url_parts[1] if len(url_parts) > 1 else '/'
     if not key:
         key = '/'
+    return key
+
+def get_page_metatags(key, metatags):
+    if key not in metatags:
+        print("Warning: No metatags defined for this page. Using default metatags.")
+        key = '/'
+       
+    title = metatags.get(key, {}).get('title', 'Wix Website')
+    description = metatags.get(key, {}).get('description', '')
+    keywords = metatags.get(key, {}).get('keywords', '')
+    canonical = metatags.get(key, {}).get('canonical', '')
+    image = metatags.get(key, {}).get('image', '')
+    author = metatags.get(key, {}).get('author', '')
+    return title, description, keywords, canonical, image, author
+
+# String-level fixes applied to the serialized page, shared by the browser and static renderers.
+# They run in order, like consecutive str.replace calls, so they can also be streamed (snapshot.py).
+def finalize_replacements(hostname, blockPrimaryFolder, darkWebsite):
+    replacements = [('<br>', ''), ('</body>', slideFix)]
+    if darkWebsite:
+        replacements.append(('</head>', lightModeFix))
+
+    # Fix every href to be relative 
+    replacements += [
+        ('href="https://' + hostname, 'href="'),
+        ('href="http://' + hostname, 'href="'),
+        ('href="https://www.' + hostname, 'href="'),
+        ('href="http://www.' + hostname, 'href="'),
+        ('href="www.' + hostname, 'href="'),
+        ('href="' + hostname, 'href="')
+    ]
+
+    # Remove the primaryFolder from any hrefs
+    replacements.append(('href="/' + blockPrimaryFolder, 'href="'))
+
+    # Any empty hrefs are now root hrefs, replace them with /
+    replacements.append(('href=""', 'href="/"'))
+
+    # Remove browser-sentry script
+    replacements.append(('<script src="https://browser.sentry-cdn.com/6.18.2/bundle.min.js" defer></script>', ''))
+    replacements.append(('//static.parastorage.com', 'https://static.parastorage.com'))
+    return replacements
+
+def finalize_html(html, hostname, blockPrimaryFolder, darkWebsite):
+    for old, new in finalize_replacements(hostname, blockPrimaryFolder, darkWebsite):
+        html = html.replace(old, new)
+
+    # Add doctype HTML to start 
+    return DOCTYPE + html
+
+async def fix_page(page, wait, hostname, blockPrimaryFolder, darkWebsite, forceDownloadAgain, metatags, mapData,
+                   fontPipeline=None, assetCache=None, templates=None, budget=None, stats=None, output_file=None,
+                   media=None, disabledFixers=(), cheapFirstFixers=False):
+    # Returns the final html, or with output_file streams it to that file instead and returns None
+    # media (a media.MediaLocalizer) also localizes videos, audio and CSS background images
+    # disabledFixers names fixers not to run on this site, cheapFirstFixers runs the others cheapest first
+    # Get the current page
+    key = page_key(page.url, hostname)
     print("Current page: " + key)
     
+    waitStarted = time.monotonic()
     await asyncio.sleep(wait)
-    await scroll_to_bottom(page)
+
+    # Pages of an already seen template reuse what was learned on its first page
+    plan = await templates.plan(page) if templates is not None else None
+
+    if plan is None or plan.scroll or (plan.scroll is False and await page.evaluate(PENDING_IMAGES_JS)):
+        await scroll_to_bottom(page)
+    elif plan.scroll is None:
+        before = await page.evaluate(CONTENT_STATE_JS)
+        await scroll_to_bottom(page)
+        plan.scroll = await page.evaluate(CONTENT_STATE_JS) != before
+
+    # Time spent waiting for content, and the asset counts, for the crawl report
+    if stats is None:
+        stats = {}
+    stats['wait_seconds'] = stats.get('wait_seconds', 0) + time.monotonic() - waitStarted
+
     await delete_wix(page)
-    await fix_gallery(page)
-    await fix_googlemap(page, mapData)
-    await fix_slideshow(page)
+
+    # Fix the widgets found on the page, see fixers.py
+    fixers = await detect_fixers(page, disabledFixers)
+    await run_fixers(page, fixers, cheap_first=cheapFirstFixers, mapData=mapData)
 
     # Defer all scripts
     await page.evaluate('''() => {
@@ -501,10 +608,14 @@ async def fix_page(page, wait, hostname, blockPrimaryFolder, darkWebsite, forceD
     }''')
 
     # Make all images local
-    await makeLocalImages(page, hostname, forceDownloadAgain)
+    stats['images'] = await makeLocalImages(page, hostname, forceDownloadAgain, assetCache, budget)
+
+    # Make videos, audio and background images local
+    if media is not None:
+        stats['media'] = await media.localize(page)
 
     # Make all fonts local
-    await makeFontsLocal(page, hostname, forceDownloadAgain)
+    await makeFontsLocal(page, hostname, forceDownloadAgain, fontPipeline, templates)
 
     # Delete all meta tags
     await page.evaluate('''() => {
@@ -514,16 +625,7 @@ async def fix_page(page, wait, hostname, blockPrimaryFolder, darkWebsite, forceD
         }
     }''')
 
-    if key not in metatags:
-        print("Warning: No metatags defined for this page. Using default metatags.")
-        key = '/'
-       
-    title = metatags.get(key, {}).get('title', 'Wix Website')
-    description = metatags.get(key, {}).get('description', '')
-    keywords = metatags.get(key, {}).get('keywords', '')
-    canonical = metatags.get(key, {}).get('canonical', '')
-    image = metatags.get(key, {}).get('image', '')
-    author = metatags.get(key, {}).get('author', '')
+    title, description, keywords, canonical, image, author = get_page_metatags(key, metatags)
 
     await page.evaluate(f'''() => {{
         const element = document.createElement('title');
@@ -588,41 +690,88 @@ async def fix_page(page, wait, hostname, blockPrimaryFolder, darkWebsite, forceD
         document.querySelector('head').appendChild(element);
     }''')
 
-    html = await page.evaluate('document.documentElement.outerHTML')
+    if output_file is not None:
+        await write_snapshot(page, output_file, finalize_replacements(hostname, blockPrimaryFolder, darkWebsite),
+                             prefix=DOCTYPE)
+        return None
 
-    html = html.replace('<br>', '')
-    html = html.replace('</body>', slideFix)
-    if darkWebsite:
-        html = html.replace('</head>', lightModeFix)
-    
-    # Fix every href to be relative 
-    html = html.replace('href="https://' + hostname, 'href="')
-    html = html.replace('href="http://' + hostname, 'href="')
-    html = html.replace('href="https://www.' + hostname, 'href="')
-    html = html.replace('href="http://www.' + hostname, 'href="')
-    html = html.replace('href="www.' + hostname, 'href="')
-    html = html.replace('href="' + hostname, 'href="')
+    html = await page.evaluate('document.documentElement.outerHTML')
 
-    # Remove the primaryFolder from any hrefs
-    html = html.replace('href="/' + blockPrimaryFolder, 'href="')
+    return finalize_html(html, hostname, blockPrimaryFolder, darkWebsite)
+
+async def launch_browser(p):
+    return await p.chromium.launch(
+        headless=True,
+        args=[
+            '--no-sandbox',
+            '--disable-setuid-sandbox',
+            '--disable-dev-shm-usage',
+            '--disable-gpu',
+            '--disable-extensions',
+            '--disable-software-rasterizer',
+            '--single-process'
+        ]
+    )
 
-    # Any empty hrefs are now root hrefs, replace them with /
-    html = html.replace('href=""', 'href="/"')
+def page_file(output_path, link, blockPrimaryFolder):
+    # Each page is written as index.html to a folder named after the page
+    newlink = link.replace('https://', '').replace('http://', '')
+    link_parts = newlink.split('/')
 
-    # Remove browser-sentry script
-    html = html.replace('<script src="https://browser.sentry-cdn.com/6.18.2/bundle.min.js" defer></script>', '')
-    html = html.replace('//static.parastorage.com', 'https://static.parastorage.com')
+    if len(link_parts) > 2 and blockPrimaryFolder not in link_parts[1]:
+        page_path = '/'.join(link_parts[1:])
+    else:
+        page_path = link.split('/')[-1] if link.split('/') else 'page'
+    if page_path and not os.path.exists(output_path + '/' + page_path):
+        os.makedirs(output_path + '/' + page_path)
+    return output_path + '/' + page_path + '/index.html'
 
-    # Add doctype HTML to start 
-    html = '<!DOCTYPE html>' + html
+def write_page(output_path, link, html, blockPrimaryFolder):
+    with open(page_file(output_path, link, blockPrimaryFolder), 'w', encoding="utf-8") as f:
+        f.write(html)
 
-    return html
+def read_page(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
 
 async def scrape_wix_site(site, blockPrimaryFolder='', wait=3, recursive=False, darkWebsite=False, 
                           forceDownloadAgain=False, metatags=None, mapData=None, output_dir='output',
-                          progress_callback=None):
+                          progress_callback=None, staticRender=False, subsetFonts=False, browser=None,
+                          assetCache=None, optimizeOutput=False, budget=None, localizeMedia=False,
+                          disabledFixers=None, cheapFirstFixers=False):
     """
     Main function to scrape a Wix website
+
+    With staticRender, pages without galleries, slideshows or maps are converted from
+    their server-side rendered HTML instead of a browser render, once a sample page
+    has been checked against its browser version.
+
+    With subsetFonts, the downloaded fonts are cut down to the glyphs used on the
+    crawled pages once the crawl is done.
+
+    With localizeMedia, videos, audio and CSS background images are downloaded into
+    media/ with resumable streaming downloads (see media.py).
+
+    With optimizeOutput, the pages are minified and text files get precompressed
+    .gz/.br siblings (see optimize.py).
+
+    disabledFixers lists widget fixers (gallery, googlemap, slideshow, see fixers.py)
+    that are not run on this site; their widgets are left as Wix rendered them.
+    The others run in registration order, or cheapest first with cheapFirstFixers.
+
+    Pages rendered from the same template (blog posts, products) reuse the plan
+    learned on the first of them, see pagetemplates.py.
+
+    Every crawl writes crawl_report.json and crawl_report.html with the link graph
+    and the cost of each page (see crawlreport.py).
+
+    budget (a budget.JobBudget) limits the time, pages, downloads and browser memory
+    of the crawl. Once it runs out the remaining pages are skipped and listed in
+    budget_report.json next to the partial output.
+
+    browser and assetCache let several scrapes share one Chromium instance and
+    one HTTP cache (see batch.py). The cache serves both the asset downloads
+    and the browser's image, font, stylesheet and script requests.
     """
     if metatags is None:
         metatags = {'/': {'title': 'Website', 'description': '', 'keywords': '', 'canonical': site, 'image': '', 'author': ''}}
@@ -647,86 +796,166 @@ async def scrape_wix_site(site, blockPrimaryFolder='', wait=3, recursive=False,
     if not os.path.exists(output_path):
         os.makedirs(output_path)
 
+    if budget is None:
+        budget = JobBudget()
+    budget.start()
+
+    disabledFixers = parse_fixer_names(disabledFixers)
+    for name in disabledFixers:
+        if name not in FIXERS:
+            print(f"Unknown fixer {name} ignored, known fixers: {', '.join(FIXERS)}")
+
+    fontPipeline = FontPipeline(output_path + '/fonts', forceDownloadAgain, subset=subsetFonts, assetCache=assetCache,
+                                budget=budget)
+    media = MediaLocalizer(output_path + '/media', forceDownloadAgain, budget=budget) if localizeMedia else None
+    templates = TemplateCache()
+    report = CrawlReport(site)
+
     if progress_callback:
         progress_callback(f"Starting browser...")
 
-    # Launch browser using Playwright
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-gpu',
-                '--disable-extensions',
-                '--disable-software-rasterizer',
-                '--single-process'
-            ]
-        )
-        
-        page = await browser.new_page(viewport={'width': 1920, 'height': 1080})
+    # Launch browser using Playwright, unless the caller shares one
+    async with contextlib.AsyncExitStack() as stack:
+        if browser is None:
+            from playwright.async_api import async_playwright
+            p = await stack.enter_async_context(async_playwright())
+            browser = await launch_browser(p)
+            stack.push_async_callback(browser.close)
+
+        context = await browser.new_context(viewport={'width': 1920, 'height': 1080})
+        stack.push_async_callback(context.close)
+        # Browser downloads count towards the budget and the crawl report. Requests
+        # answered by the cache route count only what the cache fetched from the origin
+        if assetCache is not None:
+            await route_through_cache(context, assetCache, budget)
+            throttle_responses(context, skip_types=CACHED_RESOURCE_TYPES)
+            budget.count_responses(context, skip_types=CACHED_RESOURCE_TYPES)
+        else:
+            throttle_responses(context)
+            budget.count_responses(context)
+        page = await context.new_page()
         page.set_default_timeout(60000)  # 60 second timeout
         
+        def page_meter():
+            # Counters at the start of a page, for its crawl report entry
+            return time.monotonic(), budget.bytes, len(fontPipeline.files)
+
+        def record_page(link, renderer, meter, stats):
+            started, bytesBefore, fontsBefore = meter
+            report.converted(link, renderer, time.monotonic() - started, stats.get('wait_seconds'), stats.get('images'),
+                             len(fontPipeline.files) - fontsBefore, budget.bytes - bytesBefore)
+
         if progress_callback:
             progress_callback(f"Navigating to {site}...")
         
-        await page.goto(site, wait_until='domcontentloaded', timeout=60000)
+        meter = page_meter()
+        await limited_goto(page, site, wait_until='domcontentloaded', timeout=60000)
         await asyncio.sleep(5)  # Wait for JS to load content
+        stats = {'wait_seconds': 5}
         
         if progress_callback:
             progress_callback(f"Processing main page...")
 
         # Fix the first page
-        html = await fix_page(page, wait, output_path, blockPrimaryFolder, darkWebsite, forceDownloadAgain, metatags, mapData)
-
-        with open(output_path + '/index.html', 'w', encoding="utf-8") as f:
-            f.write(html)
+        await fix_page(page, wait, output_path, blockPrimaryFolder, darkWebsite, forceDownloadAgain, metatags, mapData, fontPipeline, assetCache, templates, budget, stats, output_path + '/index.html', media, disabledFixers, cheapFirstFixers)
+        budget.page_done()
+        record_page(site, 'browser', meter, stats)
+        await budget.check_memory(page)
+
+        # Static rendering fast path state
+        static = {'enabled': staticRender, 'verified': False, 'sample': None}
+        if staticRender:
+            import staticrender
+
+        async def render_static(link):
+            # On a thread: the static render downloads synchronously and may back off on 429s.
+            # Until verified the render is only a sample compared with the browser's, its images aren't downloaded.
+            try:
+                return await asyncio.to_thread(staticrender.render_static_page, link, output_path, blockPrimaryFolder,
+                                               darkWebsite, forceDownloadAgain, metatags, fontPipeline, assetCache,
+                                               budget, media, disabledFixers, static['verified'])
+            except Exception as e:
+                print(f"Static render failed for {link}, using browser: {e}")
+                return None
+
+        async def verify_static(link, browser_html):
+            # Check the static render of a sample page against its browser render
+            result = static['sample'] if static['sample'] is not None else await render_static(link)
+            static['sample'] = None
+            if result is None:
+                return
+            ratio = await asyncio.to_thread(staticrender.compare_with_browser, result[0], browser_html)
+            imageRatio = await asyncio.to_thread(staticrender.compare_images, result[0], browser_html)
+            match = f"{ratio:.0%} text, {imageRatio:.0%} images match"
+            if ratio >= staticrender.STATIC_MATCH_THRESHOLD and imageRatio >= staticrender.STATIC_IMAGE_THRESHOLD:
+                static['verified'] = True
+                message = f"Static rendering verified on {link} ({match}), using fast path"
+            else:
+                static['enabled'] = False
+                message = f"Static rendering differs on {link} ({match}), using browser for all pages"
+            print(message)
+            if progress_callback:
+                progress_callback(message)
+
+        if staticRender:
+            await verify_static(site, read_page(output_path + '/index.html'))
 
         if recursive:
             seen = []
             errors = {}
             
-            async def save_links(links):
+            async def save_links(links, source):
                 nonlocal seen, errors
                 # Delete all links that are not local
                 links = [link for link in links if hostname in link]
                 # Delete all links with hash
                 links = [link for link in links if '#' not in link]
                 links = set(links)
+                report.add_links(source, sorted(links))
                 
                 for link in links:
                     if link in seen:
                         continue
 
+                    # Out of budget: finish the current page, skip the rest
+                    if budget.check():
+                        budget.skip(link)
+                        report.skipped(link)
+                        continue
+
                     try:
                         if progress_callback:
                             progress_callback(f"Processing: {link}")
+
+                        meter = page_meter()
+                        if static['enabled']:
+                            result = await render_static(link)
+                            if result is not None and static['verified']:
+                                seen.append(link)
+                                write_page(output_path, link, result[0], blockPrimaryFolder)
+                                budget.page_done()
+                                record_page(link, 'static', meter, {})
+                                await save_links(result[1], link)
+                                continue
+                            # Not verified yet, this page becomes the sample
+                            static['sample'] = result
                         
-                        await page.goto(link, wait_until='domcontentloaded', timeout=60000)
+                        await limited_goto(page, link, wait_until='domcontentloaded', timeout=60000)
                         await asyncio.sleep(3)  # Wait for JS to load content
                         seen.append(link)
+                        stats = {'wait_seconds': 3}
 
-                        html = await fix_page(page, wait, output_path, blockPrimaryFolder, darkWebsite, forceDownloadAgain, metatags, mapData)
+                        pageFile = page_file(output_path, link, blockPrimaryFolder)
+                        await fix_page(page, wait, output_path, blockPrimaryFolder, darkWebsite, forceDownloadAgain, metatags, mapData, fontPipeline, assetCache, templates, budget, stats, pageFile, media, disabledFixers, cheapFirstFixers)
 
-                        # Write each page as index.html to a folder named after the page
-                        newlink = link.replace('https://', '').replace('http://', '')
-                        link_parts = newlink.split('/')
+                        if static['enabled'] and static['sample'] is not None:
+                            await verify_static(link, read_page(pageFile))
 
-                        if len(link_parts) > 2 and blockPrimaryFolder not in link_parts[1]:
-                            page_path = '/'.join(link_parts[1:])
-                            if page_path and not os.path.exists(output_path + '/' + page_path):
-                                os.makedirs(output_path + '/' + page_path)
-                            with open(output_path + '/' + page_path + '/index.html', 'w', encoding="utf-8") as f:
-                                f.write(html)
-                        else:
-                            page_name = link.split('/')[-1] if link.split('/') else 'page'
-                            if page_name and not os.path.exists(output_path + '/' + page_name):
-                                os.makedirs(output_path + '/' + page_name)
-                            with open(output_path + '/' + page_name + '/index.html', 'w', encoding="utf-8") as f:
-                                f.write(html)
-                    
-                        await save_links(await page.eval_on_selector_all('a', 'nodes => nodes.map(n => n.href)'))
+                        budget.page_done()
+                        record_page(link, 'browser', meter, stats)
+                        await budget.check_memory(page)
+
+                        await save_links(await page.eval_on_selector_all('a', 'nodes => nodes.map(n => n.href)'), link)
 
                     except Exception as e:
                         if link in errors:
@@ -734,6 +963,7 @@ async def scrape_wix_site(site, blockPrimaryFolder='', wait=3, recursive=False,
                         else:
                             errors[link] = 1
 
+                        report.failed_attempt(link, e, gave_up=errors[link] > 3)
                         if errors[link] > 3:
                             seen.append(link)
                             print(f"Error: {link}. Giving up after 3 attempts.")
@@ -742,9 +972,33 @@ async def scrape_wix_site(site, blockPrimaryFolder='', wait=3, recursive=False,
                         print(f"Error: {link}. Try {errors[link]} of 3: {e}")
                         continue
             
-            await save_links(await page.eval_on_selector_all('a', 'nodes => nodes.map(n => n.href)'))
-        
-        await browser.close()
+            await save_links(await page.eval_on_selector_all('a', 'nodes => nodes.map(n => n.href)'), site)
+
+    if budget.exceeded:
+        message = f"Budget exhausted ({budget.exceeded}), {len(budget.skipped)} page(s) skipped"
+        print(message)
+        if progress_callback:
+            progress_callback(message)
+    if budget.limited():
+        budget.write_report(output_path)
+    report.finish()
+    report.write(output_path)
+
+    reused = sum(plan.pages - 1 for plan in templates.plans.values())
+    if reused:
+        print(f"{reused} page(s) reused a template plan ({len(templates.plans)} templates seen)")
+
+    if subsetFonts:
+        if progress_callback:
+            progress_callback(f"Subsetting fonts...")
+        await asyncio.to_thread(fontPipeline.finalize)
+
+    if optimizeOutput:
+        if progress_callback:
+            progress_callback(f"Optimizing output...")
+        from optimize import optimize_site
+        summary = await asyncio.to_thread(optimize_site, output_path)
+        print(f"Optimized {summary['files']} files: {summary['bytes_before']} -> {summary['bytes_after']} bytes")
     
     if progress_callback:
         progress_callback(f"Completed! Files saved to {output_path}")
@@ -765,6 +1019,12 @@ async def main():
     forceDownloadAgain = data['forceDownloadAgain'].lower() == 'true'
     metatags = data['metatags']
     mapData = data['mapData']
+    staticRender = data.get('staticRender', 'False').lower() == 'true'
+    subsetFonts = data.get('subsetFonts', 'False').lower() == 'true'
+    optimizeOutput = data.get('optimizeOutput', 'False').lower() == 'true'
+    localizeMedia = data.get('localizeMedia', 'False').lower() == 'true'
+    disabledFixers = data.get('disabledFixers', [])
+    cheapFirstFixers = data.get('cheapFirstFixers', 'False').lower() == 'true'
 
     await scrape_wix_site(
         site=site,
@@ -774,7 +1034,13 @@ async def main():
         darkWebsite=darkWebsite,
         forceDownloadAgain=forceDownloadAgain,
         metatags=metatags,
-        mapData=mapData
+        mapData=mapData,
+        staticRender=staticRender,
+        subsetFonts=subsetFonts,
+        optimizeOutput=optimizeOutput,
+        localizeMedia=localizeMedia,
+        disabledFixers=disabledFixers,
+        cheapFirstFixers=cheapFirstFixers
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+# Standalone conversion worker
+# Claims jobs from the broker, runs scrape_wix_site and reports progress and results back.
+# The web app and the workers must share OUTPUT_DIR (e.g. a network filesystem). Workers on the
+# app's host use its SQLite broker directly, workers on other hosts go through the app's /broker endpoints.
+#
+# Usage: BROKER_URL=sqlite:////srv/wixscraper/broker.db python worker.py [--concurrency 1]
+#        BROKER_URL=http://web:5000/broker BROKER_TOKEN=... python worker.py
+
+import argparse
+import asyncio
+import os
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from playwright.async_api import async_playwright
+
+from assetcache import AssetCache
+from broker import get_broker, LEASE_SECONDS
+from conversion import scrape_options, job_output_dir, package_site
+from crawlreport import keep_report
+from wixscraper import scrape_wix_site, launch_browser
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.environ.get('OUTPUT_DIR', os.path.join(BASE_DIR, 'converted_sites'))
+ASSET_CACHE_DIR = os.environ.get('ASSET_CACHE_DIR', os.path.join(BASE_DIR, 'asset_cache'))
+ASSET_CACHE_MB = float(os.environ.get('ASSET_CACHE_MB', 1024))
+
+# Seconds between polls of an empty queue
+POLL_SECONDS = 2
+
+
+class Lease:
+    """
+    Renews a job's lease from its own thread, so synchronous work blocking the
+    event loop (downloads, rate limit backoff) can't let the lease expire.
+    """
+
+    def __init__(self, broker, job_id, worker_id):
+        self.broker = broker
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self._stop.wait(LEASE_SECONDS / 3):
+            try:
+                if not self.broker.heartbeat(self.job_id, self.worker_id):
+                    print(f"[{self.job_id}] Lease lost, another worker may have taken the job")
+                    return
+            except Exception as e:
+                print(f"[{self.job_id}] Lease renewal failed: {e}")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+async def run_job(broker, job, worker_id, browser, asset_cache):
+    job_id = job['id']
+    site_url = job['payload']['url']
+    options = job['payload'].get('options', {})
+
+    # Progress is published from one thread, in order, without blocking the event loop
+    publisher = ThreadPoolExecutor(max_workers=1)
+
+    def progress_callback(message):
+        publisher.submit(broker.publish, job_id, message)
+        print(f"[{job_id}] {message}")
+
+    lease = Lease(broker, job_id, worker_id)
+    lease.start()
+    try:
+        progress_callback(f"Starting conversion on {worker_id}...")
+        kwargs = scrape_options(site_url, options)
+        budget = kwargs['budget']
+        output_path = await scrape_wix_site(
+            output_dir=job_output_dir(OUTPUT_DIR, job_id),
+            progress_callback=progress_callback,
+            browser=browser,
+            assetCache=asset_cache,
+            **kwargs
+        )
+
+        progress_callback("Creating ZIP archive...")
+        zip_path, zip_filename = await asyncio.to_thread(package_site, OUTPUT_DIR, job_id, site_url, output_path)
+        await asyncio.to_thread(publisher.shutdown)
+        crawl_summary = await asyncio.to_thread(keep_report, OUTPUT_DIR, job_id, output_path)
+        result = {'output_path': output_path, 'zip_path': zip_path, 'zip_filename': zip_filename,
+                  'budget': budget.report() if budget.limited() else None,
+                  'crawl_summary': crawl_summary}
+        if await asyncio.to_thread(broker.complete, job_id, worker_id, result):
+            print(f"[{job_id}] Completed")
+        else:
+            print(f"[{job_id}] Finished after losing the job to another worker, result dropped")
+
+    except Exception as e:
+        await asyncio.to_thread(publisher.shutdown)
+        await asyncio.to_thread(broker.publish, job_id, f"Error: {str(e)}")
+        await asyncio.to_thread(broker.fail, job_id, worker_id, e)
+        print(f"[{job_id}] Error: {str(e)}")
+        print(f"[{job_id}] Traceback:\n{traceback.format_exc()}")
+
+    finally:
+        lease.stop()
+        publisher.shutdown(wait=False)
+
+
+async def work(broker, worker_id, concurrency):
+    asset_cache = AssetCache(ASSET_CACHE_DIR, max_bytes=int(ASSET_CACHE_MB * 1024 * 1024))
+
+    async with async_playwright() as p:
+        # One browser per worker process, shared by its jobs
+        browser = await launch_browser(p)
+
+        async def loop(slot):
+            slot_id = f"{worker_id}/{slot}"
+            while True:
+                if not browser.is_connected():
+                    raise RuntimeError('Browser disconnected')
+                job = await asyncio.to_thread(broker.claim, slot_id)
+                if job is None:
+                    await asyncio.sleep(POLL_SECONDS)
+                    continue
+                print(f"[{slot_id}] Claimed job {job['id']}: {job['payload']['url']}")
+                await run_job(broker, job, slot_id, browser, asset_cache)
+
+        try:
+            await asyncio.gather(*(loop(slot) for slot in range(concurrency)))
+        finally:
+            await browser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run Wix conversion jobs from the broker')
+    parser.add_argument('--broker', default=os.environ.get('BROKER_URL'), help='broker url (default: $BROKER_URL)')
+    parser.add_argument('--concurrency', type=int, default=1, help='jobs converted at the same time')
+    parser.add_argument('--name', default=f"{socket.gethostname()}-{uuid.uuid4().hex[:4]}", help='worker name')
+    args = parser.parse_args()
+
+    if not args.broker:
+        parser.error('set BROKER_URL or pass --broker, e.g. sqlite:///broker.db or http://web:5000/broker')
+
+    print(f"Worker {args.name} waiting for jobs (concurrency {args.concurrency})...")
+    asyncio.run(work(get_broker(args.broker), args.name, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()